@@ -1,14 +1,58 @@
+# startup d'abord : hors Linux, elapsed_ms compte à partir de son importation
+import startup
+
 import pygame
 import random
 import math
+import bisect
+import copy
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
 
-# Initialisation de Pygame
-pygame.init()
+from fixed_timestep import FixedTimestep
+from frame_pipeline import FramePipeline
+from frame_profiler import FrameProfiler
+from journal_galaxia import EnregistreurPartie
+
+# Pygame n'est initialisé que par ouvrir_ecran, et seulement l'affichage et les
+# polices : l'importation (rejeu, lots) ne démarre rien
 
 # Dimensions de l'écran
 LARGEUR = 800
 HAUTEUR = 600
 
+# Pas de logique par seconde : vitesses et recharges sont comptées en pas,
+# quelle que soit la fréquence d'affichage
+FREQUENCE_LOGIQUE = 60
+PAS_RATTRAPAGE_MAX = 5
+# Au-delà (téléportation, retour en haut de l'écran), pas d'interpolation
+SAUT_MAX = 100
+# N'envoyer à l'écran que les zones modifiées (bornes peu puissantes)
+RENDU_ZONES_MODIFIEES = False
+# Logique sur un autre fil pendant que l'image précédente est dessinée et
+# affichée ; l'écran a alors une image de retard sur la partie
+JEU_EN_PIPELINE = False
+# Délai visé entre le lancement et la première image du menu
+CIBLE_PREMIERE_IMAGE_MS = 1000
+# Journal de la dernière partie jouée, relu par galaxia_rejeu.py (None : pas de
+# journal). Il va dans le cache de l'utilisateur, pas dans le dossier courant.
+JOURNAL_PARTIE = os.path.join(startup.CACHE_DIR, 'galaxia_derniere_partie.gxj')
+# Mesures par image (.jsonl ou .csv) ; F3 affiche le profilage dans tous les cas
+EXPORT_PROFILAGE = None
+
+# Actions du joueur pour un pas de logique, en masque de bits : les
+# déplacements sont maintenus, les trois dernières valent pour un seul pas
+ACTION_GAUCHE = 1
+ACTION_DROITE = 2
+ACTION_HAUT = 4
+ACTION_BAS = 8
+ACTION_TIR = 16
+ACTION_BOUCLIER = 32
+ACTION_EXPLOSION = 64
+
 # Couleurs
 NOIR = (0, 0, 0)
 BLANC = (255, 255, 255)
@@ -17,9 +61,161 @@ BLEU = (0, 0, 255)
 VERT = (0, 255, 0)
 JAUNE = (255, 255, 0)
 
-# Création de l'écran
-ecran = pygame.display.set_mode((LARGEUR, HAUTEUR))
-pygame.display.set_caption("Galaxia Avancé")
+# L'écran n'est créé que par ouvrir_ecran(), pour que la logique du jeu
+# (EtatJeu) puisse tourner sans affichage
+ecran = None
+
+def ouvrir_ecran():
+    global ecran
+    pygame.display.init()
+    pygame.font.init()
+    ecran = pygame.display.set_mode((LARGEUR, HAUTEUR))
+    pygame.display.set_caption("Galaxia Avancé")
+    return ecran
+
+# Images des sprites, dessinées une seule fois et partagées entre instances
+def creer_image_vaisseau(type_vaisseau):
+    image = pygame.Surface((40, 50), pygame.SRCALPHA)
+    if type_vaisseau == 'standard':
+        pygame.draw.polygon(image, BLANC, [(20, 0), (0, 50), (40, 50)])
+        pygame.draw.rect(image, BLEU, (15, 35, 10, 15))
+    elif type_vaisseau == 'rapide':
+        pygame.draw.polygon(image, VERT, [(20, 0), (0, 50), (40, 50)])
+        pygame.draw.rect(image, JAUNE, (15, 35, 10, 15))
+    elif type_vaisseau == 'puissant':
+        pygame.draw.polygon(image, ROUGE, [(20, 0), (0, 50), (40, 50)])
+        pygame.draw.rect(image, BLANC, (15, 35, 10, 15))
+    return image
+
+def creer_image_laser(type_laser):
+    if type_laser == 'puissant':
+        image = pygame.Surface((8, 30))
+        image.fill(ROUGE)
+    else:
+        image = pygame.Surface((4, 20))
+        image.fill(BLEU if type_laser == 'rapide' else VERT)
+    return image
+
+def creer_image_ennemi(niveau):
+    if niveau == 1:
+        image = pygame.Surface((30, 30), pygame.SRCALPHA)
+        pygame.draw.circle(image, ROUGE, (15, 15), 15)
+    elif niveau == 2:
+        image = pygame.Surface((40, 40), pygame.SRCALPHA)
+        pygame.draw.polygon(image, JAUNE, [(20, 0), (40, 40), (0, 40)])
+    else:
+        image = pygame.Surface((50, 50), pygame.SRCALPHA)
+        pygame.draw.rect(image, BLEU, (0, 0, 50, 50))
+        pygame.draw.circle(image, ROUGE, (25, 25), 15)
+    return image
+
+def creer_image_boss():
+    image = pygame.Surface((100, 100), pygame.SRCALPHA)
+    pygame.draw.rect(image, ROUGE, (0, 0, 100, 100))
+    pygame.draw.circle(image, JAUNE, (50, 50), 30)
+    return image
+
+def creer_image_power_up(type_power_up):
+    image = pygame.Surface((20, 20), pygame.SRCALPHA)
+    if type_power_up == 'bouclier':
+        pygame.draw.circle(image, BLEU, (10, 10), 10)
+    elif type_power_up == 'vitesse':
+        pygame.draw.polygon(image, VERT, [(10, 0), (20, 20), (0, 20)])
+    else:
+        pygame.draw.rect(image, JAUNE, (0, 0, 20, 20))
+    return image
+
+def creer_image_asteroide():
+    image = pygame.Surface((30, 30), pygame.SRCALPHA)
+    pygame.draw.circle(image, (100, 100, 100), (15, 15), 15)
+    return image
+
+def creer_image_zone_danger():
+    image = pygame.Surface((100, 100), pygame.SRCALPHA)
+    image.fill((255, 0, 0, 128))
+    return image
+
+# Registre des images : chaque (type, variante) est dessinée puis convertie au
+# format de l'écran à la première demande, ensuite tous les sprites la partagent.
+# Les sprites ne doivent donc jamais dessiner sur leur self.image.
+class RegistreImages:
+    def __init__(self):
+        self.fabriques = {}
+        self.images = {}
+
+    def enregistrer(self, type_image, fabrique, variantes=((),)):
+        self.fabriques[type_image] = (fabrique, variantes)
+
+    def image(self, type_image, *variante):
+        cle = (type_image,) + variante
+        image = self.images.get(cle)
+        if image is None:
+            image = self.fabriques[type_image][0](*variante)
+            if pygame.display.get_surface() is not None:
+                # Même format de pixels que l'écran : les blits prennent le chemin rapide de SDL
+                image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+            self.images[cle] = image
+        return image
+
+    def precharger(self):
+        for type_image, (_, variantes) in self.fabriques.items():
+            for variante in variantes:
+                self.image(type_image, *variante)
+
+images = RegistreImages()
+images.enregistrer('vaisseau', creer_image_vaisseau, [('standard',), ('rapide',), ('puissant',)])
+images.enregistrer('laser', creer_image_laser, [('normal',), ('rapide',), ('puissant',)])
+images.enregistrer('ennemi', creer_image_ennemi, [(1,), (2,), (3,)])
+images.enregistrer('boss', creer_image_boss)
+images.enregistrer('power_up', creer_image_power_up, [('bouclier',), ('vitesse',), ('tir_multiple',)])
+images.enregistrer('asteroide', creer_image_asteroide)
+images.enregistrer('zone_danger', creer_image_zone_danger)
+
+# Réserves de sprites : un sprite recyclable tué (il quitte tous ses groupes)
+# retourne dans la réserve de sa classe, qui le réinitialise au lieu d'en
+# créer un nouveau au prochain tir ou à la prochaine apparition
+class ReserveSprites:
+    def __init__(self, classe):
+        self.classe = classe
+        self.libres = []
+        self.succes = 0
+        self.echecs = 0
+
+    def obtenir(self, *args):
+        if self.libres:
+            sprite = self.libres.pop()
+            sprite.reinitialiser(*args)
+            # Pas d'interpolation depuis sa position dans sa vie précédente
+            sprite.position_precedente = sprite.rect.topleft
+            self.succes += 1
+        else:
+            sprite = self.classe(*args)
+            sprite.reserve = self
+            self.echecs += 1
+        return sprite
+
+    def rendre(self, sprite):
+        self.libres.append(sprite)
+
+class SpriteRecyclable(pygame.sprite.Sprite):
+    reserve = None
+
+    def kill(self):
+        recycler = self.reserve is not None and self.alive()
+        super().kill()
+        if recycler:
+            self.reserve.rendre(self)
+
+reserves = {}
+
+def reserve_de(classe):
+    if classe not in reserves:
+        reserves[classe] = ReserveSprites(classe)
+    return reserves[classe]
+
+def statistiques_reserves():
+    return {classe.__name__: {'succes': r.succes, 'echecs': r.echecs, 'libres': len(r.libres)}
+            for classe, r in reserves.items()}
 
 # Classe pour le vaisseau du joueur
 class Vaisseau(pygame.sprite.Sprite):
@@ -38,7 +234,8 @@ class Vaisseau(pygame.sprite.Sprite):
         self.capacite_explosion = 0
         self.type_laser = 'normal'
         self.combo = 0
-        self.temps_dernier_kill = 0
+        self.tick_dernier_kill = 0
+        self.actions = 0
         self.pimpage = {
             'vitesse': 0,
             'bouclier': 0,
@@ -46,27 +243,17 @@ class Vaisseau(pygame.sprite.Sprite):
         }
 
     def creer_image(self):
-        image = pygame.Surface((40, 50), pygame.SRCALPHA)
-        if self.type_vaisseau == 'standard':
-            pygame.draw.polygon(image, BLANC, [(20, 0), (0, 50), (40, 50)])
-            pygame.draw.rect(image, BLEU, (15, 35, 10, 15))
-        elif self.type_vaisseau == 'rapide':
-            pygame.draw.polygon(image, VERT, [(20, 0), (0, 50), (40, 50)])
-            pygame.draw.rect(image, JAUNE, (15, 35, 10, 15))
-        elif self.type_vaisseau == 'puissant':
-            pygame.draw.polygon(image, ROUGE, [(20, 0), (0, 50), (40, 50)])
-            pygame.draw.rect(image, BLANC, (15, 35, 10, 15))
-        return image
+        return images.image('vaisseau', self.type_vaisseau)
 
     def update(self):
-        touches = pygame.key.get_pressed()
-        if (touches[pygame.K_LEFT] or touches[pygame.K_a]) and self.rect.left > 0:
+        # self.actions : masque ACTION_* du pas en cours, posé par EtatJeu
+        if self.actions & ACTION_GAUCHE and self.rect.left > 0:
             self.rect.x -= self.vitesse + self.pimpage['vitesse']
-        if (touches[pygame.K_RIGHT] or touches[pygame.K_d]) and self.rect.right < LARGEUR:
+        if self.actions & ACTION_DROITE and self.rect.right < LARGEUR:
             self.rect.x += self.vitesse + self.pimpage['vitesse']
-        if (touches[pygame.K_UP] or touches[pygame.K_w]) and self.rect.top > 0:
+        if self.actions & ACTION_HAUT and self.rect.top > 0:
             self.rect.y -= self.vitesse + self.pimpage['vitesse']
-        if (touches[pygame.K_DOWN] or touches[pygame.K_s]) and self.rect.bottom < HAUTEUR:
+        if self.actions & ACTION_BAS and self.rect.bottom < HAUTEUR:
             self.rect.y += self.vitesse + self.pimpage['vitesse']
 
         if self.capacite_bouclier > 0:
@@ -76,11 +263,12 @@ class Vaisseau(pygame.sprite.Sprite):
 
     def tirer(self):
         if self.type_laser == 'normal':
-            return Laser(self.rect.centerx, self.rect.top, self.pimpage['puissance_tir'])
+            classe = Laser
         elif self.type_laser == 'rapide':
-            return LaserRapide(self.rect.centerx, self.rect.top, self.pimpage['puissance_tir'])
+            classe = LaserRapide
         elif self.type_laser == 'puissant':
-            return LaserPuissant(self.rect.centerx, self.rect.top, self.pimpage['puissance_tir'])
+            classe = LaserPuissant
+        return reserve_de(classe).obtenir(self.rect.centerx, self.rect.top, self.pimpage['puissance_tir'])
 
     def gagner_xp(self, quantite):
         self.xp += quantite
@@ -103,23 +291,26 @@ class Vaisseau(pygame.sprite.Sprite):
             return True
         return False
 
-    def incrementer_combo(self):
-        temps_actuel = pygame.time.get_ticks()
-        if temps_actuel - self.temps_dernier_kill < 1000:  # 1 seconde
+    def incrementer_combo(self, tick):
+        if tick - self.tick_dernier_kill < FREQUENCE_LOGIQUE:  # 1 seconde
             self.combo += 1
         else:
             self.combo = 0
-        self.temps_dernier_kill = temps_actuel
+        self.tick_dernier_kill = tick
 
     def calculer_score(self, score_base):
         return score_base * (1 + self.combo * 0.1)
 
 # Classe pour les lasers
-class Laser(pygame.sprite.Sprite):
+class Laser(SpriteRecyclable):
+    type_laser = 'normal'
+
     def __init__(self, x, y, puissance_supplementaire=0):
         super().__init__()
-        self.image = pygame.Surface((4, 20))
-        self.image.fill(VERT)
+        self.reinitialiser(x, y, puissance_supplementaire)
+
+    def reinitialiser(self, x, y, puissance_supplementaire=0):
+        self.image = images.image('laser', self.type_laser)
         self.rect = self.image.get_rect()
         self.rect.centerx = x
         self.rect.bottom = y
@@ -131,46 +322,45 @@ class Laser(pygame.sprite.Sprite):
         if self.rect.bottom < 0:
             self.kill()
 
+    def rect_collision(self):
+        # Tout le trajet du dernier pas, pour qu'un laser rapide ne passe pas à travers une cible
+        return self.rect.union(self.rect.move(0, -self.vitesse))
+
 class LaserRapide(Laser):
-    def __init__(self, x, y, puissance_supplementaire=0):
-        super().__init__(x, y, puissance_supplementaire)
-        self.image.fill(BLEU)
+    type_laser = 'rapide'
+
+    def reinitialiser(self, x, y, puissance_supplementaire=0):
+        super().reinitialiser(x, y, puissance_supplementaire)
         self.vitesse = -15
         self.puissance = 5 + puissance_supplementaire
 
 class LaserPuissant(Laser):
-    def __init__(self, x, y, puissance_supplementaire=0):
-        super().__init__(x, y, puissance_supplementaire)
-        self.image = pygame.Surface((8, 30))
-        self.image.fill(ROUGE)
+    type_laser = 'puissant'
+
+    def reinitialiser(self, x, y, puissance_supplementaire=0):
+        super().reinitialiser(x, y, puissance_supplementaire)
         self.vitesse = -8
         self.puissance = 20 + puissance_supplementaire
 
 # Classe pour les ennemis
-class Ennemi(pygame.sprite.Sprite):
-    def __init__(self, niveau):
+class Ennemi(SpriteRecyclable):
+    def __init__(self, niveau, rng=random):
         super().__init__()
+        self.reinitialiser(niveau, rng)
+
+    def reinitialiser(self, niveau, rng=random):
+        self.rng = rng
         self.niveau = niveau
         self.image = self.creer_image()
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, LARGEUR - self.rect.width)
-        self.rect.y = random.randint(-100, -40)
-        self.vitesse = random.randint(1, 3 + self.niveau)
-        self.direction = random.choice([-1, 1])
+        self.rect.x = rng.randint(0, LARGEUR - self.rect.width)
+        self.rect.y = rng.randint(-100, -40)
+        self.vitesse = rng.randint(1, 3 + self.niveau)
+        self.direction = rng.choice([-1, 1])
         self.vie = 10 * self.niveau
 
     def creer_image(self):
-        if self.niveau == 1:
-            image = pygame.Surface((30, 30), pygame.SRCALPHA)
-            pygame.draw.circle(image, ROUGE, (15, 15), 15)
-        elif self.niveau == 2:
-            image = pygame.Surface((40, 40), pygame.SRCALPHA)
-            pygame.draw.polygon(image, JAUNE, [(20, 0), (40, 40), (0, 40)])
-        else:
-            image = pygame.Surface((50, 50), pygame.SRCALPHA)
-            pygame.draw.rect(image, BLEU, (0, 0, 50, 50))
-            pygame.draw.circle(image, ROUGE, (25, 25), 15)
-        return image
+        return images.image('ennemi', min(self.niveau, 3))
 
     def update(self):
         self.rect.y += self.vitesse
@@ -178,54 +368,48 @@ class Ennemi(pygame.sprite.Sprite):
         if self.rect.left < 0 or self.rect.right > LARGEUR:
             self.direction *= -1
         if self.rect.top > HAUTEUR:
-            self.rect.x = random.randint(0, LARGEUR - self.rect.width)
-            self.rect.y = random.randint(-100, -40)
-            self.vitesse = random.randint(1, 3 + self.niveau)
+            self.rect.x = self.rng.randint(0, LARGEUR - self.rect.width)
+            self.rect.y = self.rng.randint(-100, -40)
+            self.vitesse = self.rng.randint(1, 3 + self.niveau)
 
 # Classe pour le boss
 class Boss(pygame.sprite.Sprite):
     def __init__(self, niveau):
         super().__init__()
-        self.image = pygame.Surface((100, 100), pygame.SRCALPHA)
-        pygame.draw.rect(self.image, ROUGE, (0, 0, 100, 100))
-        pygame.draw.circle(self.image, JAUNE, (50, 50), 30)
+        self.image = images.image('boss')
         self.rect = self.image.get_rect()
         self.rect.centerx = LARGEUR // 2
         self.rect.top = -self.rect.height
         self.vie = 100 * niveau
         self.vitesse = 2
         self.phase = 'descente'
-        self.temps_dernier_tir = 0
+        self.age = 0  # en pas de logique
+        self.age_dernier_tir = None
 
     def update(self):
+        self.age += 1
         if self.phase == 'descente':
             self.rect.y += self.vitesse
             if self.rect.top >= 50:
                 self.phase = 'combat'
         elif self.phase == 'combat':
-            self.rect.x += math.sin(pygame.time.get_ticks() * 0.005) * 5
+            millisecondes = self.age * 1000 / FREQUENCE_LOGIQUE
+            self.rect.x += math.sin(millisecondes * 0.005) * 5
 
     def tirer(self):
-        temps_actuel = pygame.time.get_ticks()
-        if temps_actuel - self.temps_dernier_tir > 1000:  # Tir toutes les secondes
-            self.temps_dernier_tir = temps_actuel
-            return [Laser(self.rect.centerx, self.rect.bottom) for _ in range(3)]
+        if self.age_dernier_tir is None or self.age - self.age_dernier_tir > FREQUENCE_LOGIQUE:  # Tir toutes les secondes
+            self.age_dernier_tir = self.age
+            return [reserve_de(Laser).obtenir(self.rect.centerx, self.rect.bottom) for _ in range(3)]
         return []
 
 # Classe pour les power-ups
 class PowerUp(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, rng=random):
         super().__init__()
-        self.type = random.choice(['bouclier', 'vitesse', 'tir_multiple'])
-        self.image = pygame.Surface((20, 20), pygame.SRCALPHA)
-        if self.type == 'bouclier':
-            pygame.draw.circle(self.image, BLEU, (10, 10), 10)
-        elif self.type == 'vitesse':
-            pygame.draw.polygon(self.image, VERT, [(10, 0), (20, 20), (0, 20)])
-        else:
-            pygame.draw.rect(self.image, JAUNE, (0, 0, 20, 20))
+        self.type = rng.choice(['bouclier', 'vitesse', 'tir_multiple'])
+        self.image = images.image('power_up', self.type)
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, LARGEUR - self.rect.width)
+        self.rect.x = rng.randint(0, LARGEUR - self.rect.width)
         self.rect.y = -self.rect.height
         self.vitesse = 2
 
@@ -235,33 +419,35 @@ class PowerUp(pygame.sprite.Sprite):
             self.kill()
 
 # Classe pour les astéroïdes
-class Asteroide(pygame.sprite.Sprite):
-    def __init__(self):
+class Asteroide(SpriteRecyclable):
+    def __init__(self, rng=random):
         super().__init__()
-        self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
-        pygame.draw.circle(self.image, (100, 100, 100), (15, 15), 15)
+        self.reinitialiser(rng)
+
+    def reinitialiser(self, rng=random):
+        self.rng = rng
+        self.image = images.image('asteroide')
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, LARGEUR - self.rect.width)
-        self.rect.y = random.randint(-100, -40)
-        self.vitesse = random.randint(1, 3)
-        self.ressources = random.randint(10, 50)
+        self.rect.x = rng.randint(0, LARGEUR - self.rect.width)
+        self.rect.y = rng.randint(-100, -40)
+        self.vitesse = rng.randint(1, 3)
+        self.ressources = rng.randint(10, 50)
 
     def update(self):
         self.rect.y += self.vitesse
         if self.rect.top > HAUTEUR:
-            self.rect.x = random.randint(0, LARGEUR - self.rect.width)
-            self.rect.y = random.randint(-100, -40)
-            self.vitesse = random.randint(1, 3)
+            self.rect.x = self.rng.randint(0, LARGEUR - self.rect.width)
+            self.rect.y = self.rng.randint(-100, -40)
+            self.vitesse = self.rng.randint(1, 3)
 
 # Classe pour les zones de danger
 class ZoneDanger(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, rng=random):
         super().__init__()
-        self.image = pygame.Surface((100, 100), pygame.SRCALPHA)
-        self.image.fill((255, 0, 0, 128))
+        self.image = images.image('zone_danger')
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, LARGEUR - self.rect.width)
-        self.rect.y = random.randint(0, HAUTEUR - self.rect.height)
+        self.rect.x = rng.randint(0, LARGEUR - self.rect.width)
+        self.rect.y = rng.randint(0, HAUTEUR - self.rect.height)
         self.duree = 300  # 5 secondes
 
     def update(self):
@@ -269,22 +455,106 @@ class ZoneDanger(pygame.sprite.Sprite):
         if self.duree <= 0:
             self.kill()
 
-# Classe pour les étoiles (arrière-plan)
-class Etoile(pygame.sprite.Sprite):
-    def __init__(self):
-        super().__init__()
-        self.image = pygame.Surface((2, 2))
-        self.image.fill(BLANC)
-        self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, LARGEUR)
-        self.rect.y = random.randint(0, HAUTEUR)
-        self.vitesse = random.randint(1, 3)
+# Champ d'étoiles (arrière-plan) : positions et vitesses dans des tableaux,
+# avancées d'un bloc et écrites directement dans les pixels de l'écran. Chaque
+# couche de parallaxe est (nombre d'étoiles, vitesse, couleur) : les plus
+# lointaines défilent moins vite et sont plus sombres.
+COUCHES_ETOILES = ((50, 1, (110, 110, 110)), (30, 2, (180, 180, 180)), (20, 3, BLANC))
+
+class ChampEtoiles:
+    def __init__(self, couches=COUCHES_ETOILES, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        nombres = [nombre for nombre, _, _ in couches]
+        self.x = self.rng.integers(0, LARGEUR, sum(nombres), endpoint=True).astype(np.int32)
+        self.y = self.rng.uniform(0, HAUTEUR, sum(nombres)).astype(np.float32)
+        self.vitesse = np.repeat([vitesse for _, vitesse, _ in couches], nombres).astype(np.float32)
+        self.couleurs = [couleur for _, _, couleur in couches]
+        self.couche = np.repeat(np.arange(len(couches)), nombres)
+
+    # Copie figée pour VueJeu : seules les positions changent d'un pas à l'autre
+    def copier(self):
+        copie = copy.copy(self)
+        copie.x = self.x.copy()
+        copie.y = self.y.copy()
+        return copie
 
     def update(self):
-        self.rect.y += self.vitesse
-        if self.rect.top > HAUTEUR:
-            self.rect.x = random.randint(0, LARGEUR)
-            self.rect.y = 0
+        self.y += self.vitesse
+        sorties = np.flatnonzero(self.y > HAUTEUR)
+        if sorties.size:
+            self.x[sorties] = self.rng.integers(0, LARGEUR, sorties.size, endpoint=True)
+            self.y[sorties] = 0
+
+    # Dessine les étoiles (carrés de 2x2) à alpha entre le pas précédent et le
+    # dernier ; avec zones=True, renvoie aussi leurs rectangles pour RenduEcran
+    def dessiner(self, surface, alpha=1.0, zones=False):
+        largeur, hauteur = surface.get_size()
+        x = self.x
+        y = (self.y - self.vitesse * (1 - alpha)).astype(np.int32)
+        visibles = (x >= 0) & (x < largeur - 1) & (y >= 0) & (y < hauteur - 1)
+        x, y, couche = x[visibles], y[visibles], self.couche[visibles]
+        if surface.get_bytesize() == 4:
+            palette = np.array([surface.map_rgb(couleur) for couleur in self.couleurs], dtype=np.uint32)
+            pixels = pygame.surfarray.pixels2d(surface)
+            valeurs = palette[couche]
+            for dx in (0, 1):
+                for dy in (0, 1):
+                    pixels[x + dx, y + dy] = valeurs
+            del pixels  # libère le verrou de la surface avant les blits
+        else:
+            for ex, ey, c in zip(x.tolist(), y.tolist(), couche.tolist()):
+                surface.fill(self.couleurs[c], (ex, ey, 2, 2))
+        if zones:
+            return [pygame.Rect(ex, ey, 2, 2) for ex, ey in zip(x.tolist(), y.tolist())]
+        return []
+
+# Moteur de collisions par balayage (sweep and prune) sur l'axe x : chaque groupe
+# est trié une seule fois par pas sur le bord gauche de ses rectangles, puis chaque
+# paire de groupes ne teste que les rectangles dont l'intervalle en x chevauche
+class AxeTrie:
+    def __init__(self, sprites):
+        self.sprites = list(sprites)
+        rects = [sprite.rect_collision() if hasattr(sprite, 'rect_collision') else sprite.rect
+                 for sprite in self.sprites]
+        gauches = [rect.left for rect in rects]
+        self.ordre = sorted(range(len(rects)), key=gauches.__getitem__)
+        self.rects = [rects[i] for i in self.ordre]
+        self.gauches = [gauches[i] for i in self.ordre]
+        self.largeur_max = max((rect.width for rect in rects), default=0)
+
+    # Numéros (dans le groupe) des sprites dont le rectangle touche rect
+    def chevauchements(self, rect):
+        debut = bisect.bisect_right(self.gauches, rect.left - self.largeur_max)
+        fin = bisect.bisect_left(self.gauches, rect.right)
+        return [self.ordre[debut + k] for k in rect.collidelistall(self.rects[debut:fin])]
+
+class MoteurCollisions:
+    # Prend {nom: (sprites_a, sprites_b)} et renvoie {nom: [(a, b), ...]}, dans
+    # l'ordre d'itération des groupes comme une boucle de spritecollide. Un sprite
+    # peut fournir rect_collision() pour être testé sur un autre rectangle que self.rect.
+    def detecter(self, requetes):
+        axes = {}
+        for sprites_a, sprites_b in requetes.values():
+            for sprites in (sprites_a, sprites_b):
+                if id(sprites) not in axes:
+                    axes[id(sprites)] = AxeTrie(sprites)
+
+        contacts = {}
+        for nom, (sprites_a, sprites_b) in requetes.items():
+            axe_a, axe_b = axes[id(sprites_a)], axes[id(sprites_b)]
+            paires = []
+            # On parcourt le plus petit des deux groupes
+            if len(axe_a.rects) <= len(axe_b.rects):
+                for k, rect in enumerate(axe_a.rects):
+                    i = axe_a.ordre[k]
+                    paires.extend((i, j) for j in axe_b.chevauchements(rect))
+            else:
+                for k, rect in enumerate(axe_b.rects):
+                    j = axe_b.ordre[k]
+                    paires.extend((i, j) for i in axe_a.chevauchements(rect))
+            paires.sort()
+            contacts[nom] = [(axe_a.sprites[i], axe_b.sprites[j]) for i, j in paires]
+        return contacts
 
 # Classe pour les missions
 class Mission:
@@ -301,26 +571,436 @@ class Mission:
     def est_complete(self):
         return self.progres >= self.objectif
 
+# État du jeu sans affichage ni horloge : toutes les règles de jeu_principal,
+# avancées d'un pas de logique à la fois par pas(actions). Le temps se compte
+# en pas (FREQUENCE_LOGIQUE par seconde) et tout le hasard vient de self.rng,
+# donc une même graine et les mêmes actions redonnent exactement la même partie.
+class EtatJeu:
+    def __init__(self, type_vaisseau, pimpage, graine=None, profileur=None):
+        self.graine = graine
+        self.rng = random.Random(graine)
+        self.profileur = profileur if profileur is not None else FrameProfiler()
+
+        # Création des groupes de sprites
+        self.tous_sprites = pygame.sprite.Group()
+        self.ennemis = pygame.sprite.Group()
+        self.lasers = pygame.sprite.Group()
+        self.power_ups = pygame.sprite.Group()
+        self.asteroides = pygame.sprite.Group()
+        self.zones_danger = pygame.sprite.Group()
+
+        # Création du vaisseau du joueur
+        self.vaisseau = Vaisseau(type_vaisseau)
+        self.vaisseau.pimpage = pimpage
+        self.tous_sprites.add(self.vaisseau)
+
+        # Variables du jeu
+        self.tick = 0
+        self.termine = False
+        self.score = 0
+        self.niveau = 1
+        self.ressources = 0
+        self.boss = None
+        self.missions = [
+            Mission("Détruire 10 ennemis", 10, 50),
+            Mission("Collecter 5 power-ups", 5, 100),
+            Mission("Survivre 60 secondes", 60, 150)
+        ]
+        self.mission_actuelle = self.missions[0]
+        self.collisions = MoteurCollisions()
+
+    def ajouter(self, sprite, groupe):
+        self.tous_sprites.add(sprite)
+        groupe.add(sprite)
+
+    # Copie indépendante de l'état (instantanés du rejeu) ; les images et les
+    # réserves de sprites restent partagées
+    def copier(self):
+        memo = {id(reserve): reserve for reserve in reserves.values()}
+        memo.update((id(image), image) for image in images.images.values())
+        memo[id(self.profileur)] = self.profileur
+        return copy.deepcopy(self, memo)
+
+    def pas(self, actions=0):
+        if self.termine:
+            return
+        vaisseau = self.vaisseau
+        rng = self.rng
+
+        # Actions ponctuelles, avant la mise à jour comme les touches du jeu
+        if actions & ACTION_TIR:
+            self.ajouter(vaisseau.tirer(), self.lasers)
+        if actions & ACTION_BOUCLIER:
+            vaisseau.utiliser_bouclier()
+        if actions & ACTION_EXPLOSION:
+            if vaisseau.utiliser_explosion():
+                for ennemi in self.ennemis:
+                    ennemi.vie = 0
+
+        # Mise à jour
+        vaisseau.actions = actions
+        self.tous_sprites.update()
+
+        with self.profileur.scope('apparitions'):
+            # Génération d'ennemis
+            if len(self.ennemis) < 5 + self.niveau and rng.random() < 0.02:
+                self.ajouter(reserve_de(Ennemi).obtenir(self.niveau, rng), self.ennemis)
+
+            # Génération de power-ups
+            if rng.random() < 0.005:
+                self.ajouter(PowerUp(rng), self.power_ups)
+
+            # Génération d'astéroïdes
+            if rng.random() < 0.01:
+                self.ajouter(reserve_de(Asteroide).obtenir(rng), self.asteroides)
+
+            # Génération de zones de danger
+            if rng.random() < 0.002:
+                self.ajouter(ZoneDanger(rng), self.zones_danger)
+
+            # Tirs du boss
+            if self.boss:
+                for laser in self.boss.tirer():
+                    self.ajouter(laser, self.lasers)
+
+        with self.profileur.scope('collisions'):
+            self.resoudre_collisions()
+
+        # Vérification de la mission actuelle
+        if self.mission_actuelle and self.mission_actuelle.est_complete():
+            self.score += self.mission_actuelle.recompense
+            self.missions.remove(self.mission_actuelle)
+            if self.missions:
+                self.mission_actuelle = rng.choice(self.missions)
+            else:
+                self.mission_actuelle = None
+
+        # Mise à jour du temps pour la mission de survie
+        self.tick += 1
+        if self.mission_actuelle and self.mission_actuelle.description.startswith("Survivre"):
+            self.mission_actuelle.progres = self.tick // FREQUENCE_LOGIQUE
+
+        # Apparition du boss
+        if self.score >= self.niveau * 1000 and not self.boss:
+            self.boss = Boss(self.niveau)
+            self.tous_sprites.add(self.boss)
+
+    def mettre_a_jour_mission(self, evenement):
+        if self.mission_actuelle:
+            self.mission_actuelle.mettre_a_jour(evenement)
+
+    def resoudre_collisions(self):
+        vaisseau = self.vaisseau
+        boss = [self.boss] if self.boss else []
+        # Toutes les collisions du pas, en une seule passe
+        contacts = self.collisions.detecter({
+            'laser_ennemi': (self.lasers, self.ennemis),
+            'vaisseau_ennemi': ([vaisseau], self.ennemis),
+            'vaisseau_power_up': ([vaisseau], self.power_ups),
+            'vaisseau_asteroide': ([vaisseau], self.asteroides),
+            'vaisseau_zone': ([vaisseau], self.zones_danger),
+            'vaisseau_boss': ([vaisseau], boss),
+            'boss_laser': (boss, self.lasers),
+        })
+
+        # Collisions laser-ennemi
+        for laser, ennemi in contacts['laser_ennemi']:
+            if not ennemi.alive():
+                continue
+            ennemi.vie -= laser.puissance
+            if ennemi.vie <= 0:
+                self.score += vaisseau.calculer_score(10 * ennemi.niveau)
+                vaisseau.gagner_xp(5 * ennemi.niveau)
+                ennemi.kill()
+                vaisseau.incrementer_combo(self.tick)
+                self.mettre_a_jour_mission("Détruire")
+            laser.kill()
+
+        # Collisions vaisseau-ennemi
+        for _, ennemi in contacts['vaisseau_ennemi']:
+            if not ennemi.alive():
+                continue
+            ennemi.kill()
+            vaisseau.bouclier -= 20
+            if vaisseau.bouclier <= 0:
+                self.termine = True
+
+        # Collisions vaisseau-power-up
+        for _, power_up in contacts['vaisseau_power_up']:
+            power_up.kill()
+            if power_up.type == 'bouclier':
+                vaisseau.bouclier = min(vaisseau.bouclier + 50, 100)
+            elif power_up.type == 'vitesse':
+                vaisseau.vitesse += 1
+            elif power_up.type == 'tir_multiple':
+                vaisseau.type_laser = 'rapide'
+            self.mettre_a_jour_mission("Collecter")
+
+        # Collisions vaisseau-astéroïde
+        for _, asteroide in contacts['vaisseau_asteroide']:
+            asteroide.kill()
+            self.ressources += asteroide.ressources
+
+        # Dégâts des zones de danger
+        if contacts['vaisseau_zone']:
+            vaisseau.bouclier -= 0.1
+
+        # Gestion du boss
+        if contacts['vaisseau_boss']:
+            vaisseau.bouclier -= 1
+
+        for _, laser in contacts['boss_laser']:
+            if not laser.alive():
+                continue
+            laser.kill()
+            if self.boss:
+                self.boss.vie -= laser.puissance
+                if self.boss.vie <= 0:
+                    self.score += 1000 * self.niveau
+                    self.boss.kill()
+                    self.boss = None
+                    self.niveau += 1
+
+# Actions maintenues lues au clavier pour le pas en cours
+def lire_actions_clavier():
+    touches = pygame.key.get_pressed()
+    actions = 0
+    if touches[pygame.K_LEFT] or touches[pygame.K_a]:
+        actions |= ACTION_GAUCHE
+    if touches[pygame.K_RIGHT] or touches[pygame.K_d]:
+        actions |= ACTION_DROITE
+    if touches[pygame.K_UP] or touches[pygame.K_w]:
+        actions |= ACTION_HAUT
+    if touches[pygame.K_DOWN] or touches[pygame.K_s]:
+        actions |= ACTION_BAS
+    return actions
+
+# Cache des polices par taille et des textes déjà rendus
+class CacheTexte:
+    def __init__(self, taille_max=256):
+        self.taille_max = taille_max
+        self.polices = {}
+        self.surfaces = OrderedDict()
+
+    def police(self, taille):
+        if taille not in self.polices:
+            self.polices[taille] = pygame.font.Font(None, taille)
+        return self.polices[taille]
+
+    def rendre(self, texte, taille, couleur):
+        cle = (texte, taille, tuple(couleur))
+        surface = self.surfaces.get(cle)
+        if surface is None:
+            surface = self.police(taille).render(texte, True, couleur)
+            self.surfaces[cle] = surface
+            if len(self.surfaces) > self.taille_max:
+                self.surfaces.popitem(last=False)  # le moins récemment utilisé
+        else:
+            self.surfaces.move_to_end(cle)
+        return surface
+
+cache_texte = CacheTexte()
+
 # Fonction pour dessiner le texte
 def dessiner_texte(surface, texte, taille, x, y, couleur=BLANC):
-    police = pygame.font.Font(None, taille)
-    texte_surface = police.render(texte, True, couleur)
+    texte_surface = cache_texte.rendre(texte, taille, couleur)
     texte_rect = texte_surface.get_rect()
     texte_rect.midtop = (x, y)
-    surface.blit(texte_surface, texte_rect)
+    return surface.blit(texte_surface, texte_rect)
+
+# Fonctions pour dessiner les sprites entre deux pas de logique
+def memoriser_positions(groupe):
+    for sprite in groupe:
+        sprite.position_precedente = sprite.rect.topleft
+
+def dessiner_interpole(groupe, surface, alpha):
+    zones = []
+    for sprite in groupe:
+        x, y = sprite.rect.topleft
+        precedente = getattr(sprite, 'position_precedente', None)
+        if precedente and abs(x - precedente[0]) + abs(y - precedente[1]) < SAUT_MAX:
+            x = precedente[0] + (x - precedente[0]) * alpha
+            y = precedente[1] + (y - precedente[1]) * alpha
+        zones.append(surface.blit(sprite.image, (round(x), round(y))))
+    return zones
+
+# Ce que dessiner_interpole lit d'un sprite, figé à la fin d'un pas
+class SpriteFige:
+    __slots__ = ('image', 'rect', 'position_precedente')
+
+    def __init__(self, sprite):
+        self.image = sprite.image
+        self.rect = sprite.rect.copy()
+        self.position_precedente = getattr(sprite, 'position_precedente', None)
+
+GROUPES_COMPTES = ('tous_sprites', 'ennemis', 'lasers', 'asteroides', 'power_ups', 'zones_danger')
+
+def texte_mission(etat):
+    mission = etat.mission_actuelle
+    if mission:
+        return f"Mission: {mission.description} ({mission.progres}/{mission.objectif})"
+    return None
+
+def compter_sprites(etat):
+    compteurs = {nom: len(getattr(etat, nom)) for nom in GROUPES_COMPTES}
+    compteurs['sprites_crees'] = sum(r.echecs for r in reserves.values())
+    return compteurs
+
+# Ce que dessiner_vue lit de la partie. VueDirecte le lit dans EtatJeu et
+# ChampEtoiles eux-mêmes, sans rien copier : c'est la vue du jeu sans pipeline,
+# créée une fois par partie. VueJeu en est une copie figée à la fin d'un lot de
+# pas, qu'on dessine pendant que la logique fait avancer l'état sur un autre fil.
+class VueDirecte:
+    def __init__(self, etat, etoiles):
+        self.etat = etat
+        self.etoiles = etoiles
+        self.sprites = etat.tous_sprites
+        self.alpha = 1.0
+
+    @property
+    def score(self):
+        return self.etat.score
+
+    @property
+    def niveau(self):
+        return self.etat.niveau
+
+    @property
+    def bouclier(self):
+        return int(self.etat.vaisseau.bouclier)
+
+    @property
+    def ressources(self):
+        return self.etat.ressources
+
+    @property
+    def mission(self):
+        return texte_mission(self.etat)
+
+    @property
+    def termine(self):
+        return self.etat.termine
+
+    @property
+    def compteurs(self):
+        return compter_sprites(self.etat)
+
+class VueJeu:
+    def __init__(self, etat, etoiles, alpha):
+        self.alpha = alpha
+        self.sprites = [SpriteFige(sprite) for sprite in etat.tous_sprites]
+        self.etoiles = etoiles.copier()
+        self.score = etat.score
+        self.niveau = etat.niveau
+        self.bouclier = int(etat.vaisseau.bouclier)
+        self.ressources = etat.ressources
+        self.mission = texte_mission(etat)
+        self.termine = etat.termine
+        self.compteurs = compter_sprites(etat)
+
+# Rendu de l'écran de jeu. En mode zones modifiées, comme RenderUpdates, on
+# n'efface que ce qui a été dessiné à l'image précédente et on n'envoie à
+# l'écran que ces zones et les nouvelles ; quand elles couvrent plus de
+# seuil_flip de l'écran, un flip complet revient moins cher.
+class RenduEcran:
+    def __init__(self, surface, zones_modifiees=False, fond=NOIR, seuil_flip=0.35):
+        self.surface = surface
+        self.zones_modifiees = zones_modifiees
+        self.fond = fond
+        self.aire_max = seuil_flip * surface.get_width() * surface.get_height()
+        self.precedentes = None
+        self.courantes = []
+        self.flips = 0
+        self.mises_a_jour = 0
+
+    def effacer(self):
+        if not self.zones_modifiees or self.precedentes is None:
+            self.surface.fill(self.fond)
+        else:
+            for zone in self.precedentes:
+                self.surface.fill(self.fond, zone)
+
+    def ajouter(self, zones):
+        self.courantes.extend(zone for zone in zones if zone.width and zone.height)
+
+    def presenter(self):
+        zones = None
+        if self.zones_modifiees and self.precedentes is not None:
+            zones = self.precedentes + self.courantes
+            if sum(zone.width * zone.height for zone in zones) > self.aire_max:
+                zones = None
+        if zones is None:
+            pygame.display.flip()
+            self.flips += 1
+        else:
+            pygame.display.update(zones)
+            self.mises_a_jour += 1
+        self.precedentes = self.courantes
+        self.courantes = []
+
+# Affichage à la demande pour les écrans fixes (menus). Au lieu de tourner en
+# boucle, on dort dans pygame.event.wait jusqu'à une entrée ou au plus
+# reveil_max ms, on ne redessine qu'après invalider() (ou si la fenêtre a été
+# recouverte) et jamais plus de fps_max fois par seconde. Le jeu garde sa
+# boucle continue à pas fixe. Comme FixedTimestep, on mesure le temps avec
+# perf_counter : pygame.time.get_ticks reste à 0 tant que le module time de
+# pygame n'a pas démarré, ce que ouvrir_ecran ne fait pas.
+class AffichageALaDemande:
+    EVENEMENTS_REDESSIN = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED,
+                           pygame.WINDOWSIZECHANGED)
+
+    def __init__(self, fps_max=30, reveil_max=1000, horloge=time.perf_counter):
+        self.horloge = horloge
+        self.intervalle = 1000 // fps_max
+        self.reveil_max = reveil_max
+        self.a_redessiner = True
+        self.dernier_dessin = None
+        self.dessins = 0
+
+    def invalider(self):
+        self.a_redessiner = True
+
+    def doit_dessiner(self):
+        if not self.a_redessiner:
+            return False
+        maintenant = self.horloge() * 1000
+        if self.dernier_dessin is not None and maintenant - self.dernier_dessin < self.intervalle:
+            return False
+        self.a_redessiner = False
+        self.dernier_dessin = maintenant
+        self.dessins += 1
+        return True
+
+    def evenements(self):
+        if self.a_redessiner and self.dernier_dessin is not None:
+            # Un dessin attend la fin de l'intervalle minimal entre deux images
+            delai = math.ceil(self.intervalle - (self.horloge() * 1000 - self.dernier_dessin))
+        elif self.a_redessiner:
+            delai = 0
+        else:
+            delai = self.reveil_max
+        # wait(0) attendrait indéfiniment : poll() ne bloque pas
+        evenement = pygame.event.wait(delai) if delai > 0 else pygame.event.poll()
+        evenements = [] if evenement.type == pygame.NOEVENT else [evenement]
+        evenements += pygame.event.get()
+        if any(event.type in self.EVENEMENTS_REDESSIN for event in evenements):
+            self.invalider()
+        return evenements
 
 # Fonction pour afficher le menu principal
 def menu_principal():
-    ecran.fill(NOIR)
-    dessiner_texte(ecran, "GALAXIA AVANCÉ", 64, LARGEUR // 2, HAUTEUR // 4)
-    dessiner_texte(ecran, "1. Commencer", 22, LARGEUR // 2, HAUTEUR // 2)
-    dessiner_texte(ecran, "2. Sélection du vaisseau", 22, LARGEUR // 2, HAUTEUR // 2 + 30)
-    dessiner_texte(ecran, "3. Quitter", 22, LARGEUR // 2, HAUTEUR // 2 + 60)
-    pygame.display.flip()
-
-    attente = True
-    while attente:
-        for event in pygame.event.get():
+    affichage = AffichageALaDemande()
+    while True:
+        if affichage.doit_dessiner():
+            ecran.fill(NOIR)
+            dessiner_texte(ecran, "GALAXIA AVANCÉ", 64, LARGEUR // 2, HAUTEUR // 4)
+            dessiner_texte(ecran, "1. Commencer", 22, LARGEUR // 2, HAUTEUR // 2)
+            dessiner_texte(ecran, "2. Sélection du vaisseau", 22, LARGEUR // 2, HAUTEUR // 2 + 30)
+            dessiner_texte(ecran, "3. Quitter", 22, LARGEUR // 2, HAUTEUR // 2 + 60)
+            pygame.display.flip()
+            startup.first_frame("Galaxia", CIBLE_PREMIERE_IMAGE_MS)
+
+        for event in affichage.evenements():
             if event.type == pygame.QUIT:
                 return "quitter"
             if event.type == pygame.KEYUP:
@@ -342,27 +1022,30 @@ def menu_selection_vaisseau():
         'puissance_tir': 0
     }
 
+    affichage = AffichageALaDemande()
     while True:
-        ecran.fill(NOIR)
-        dessiner_texte(ecran, "SÉLECTION DU VAISSEAU", 40, LARGEUR // 2, 50)
+        if affichage.doit_dessiner():
+            ecran.fill(NOIR)
+            dessiner_texte(ecran, "SÉLECTION DU VAISSEAU", 40, LARGEUR // 2, 50)
 
-        for i, vaisseau in enumerate(vaisseaux):
-            couleur = VERT if i == index_selection else BLANC
-            dessiner_texte(ecran, vaisseau.capitalize(), 30, LARGEUR // 2, 150 + i * 50, couleur)
+            for i, vaisseau in enumerate(vaisseaux):
+                couleur = VERT if i == index_selection else BLANC
+                dessiner_texte(ecran, vaisseau.capitalize(), 30, LARGEUR // 2, 150 + i * 50, couleur)
 
-        dessiner_texte(ecran, f"Points de pimpage: {points_pimpage}", 24, LARGEUR // 2, 300)
-        dessiner_texte(ecran, f"Vitesse: {pimpage['vitesse']} [Q]", 20, LARGEUR // 2, 340)
-        dessiner_texte(ecran, f"Bouclier: {pimpage['bouclier']} [W]", 20, LARGEUR // 2, 370)
-        dessiner_texte(ecran, f"Puissance de tir: {pimpage['puissance_tir']} [E]", 20, LARGEUR // 2, 400)
+            dessiner_texte(ecran, f"Points de pimpage: {points_pimpage}", 24, LARGEUR // 2, 300)
+            dessiner_texte(ecran, f"Vitesse: {pimpage['vitesse']} [Q]", 20, LARGEUR // 2, 340)
+            dessiner_texte(ecran, f"Bouclier: {pimpage['bouclier']} [W]", 20, LARGEUR // 2, 370)
+            dessiner_texte(ecran, f"Puissance de tir: {pimpage['puissance_tir']} [E]", 20, LARGEUR // 2, 400)
 
-        dessiner_texte(ecran, "Appuyez sur ESPACE pour confirmer", 24, LARGEUR // 2, HAUTEUR - 50)
+            dessiner_texte(ecran, "Appuyez sur ESPACE pour confirmer", 24, LARGEUR // 2, HAUTEUR - 50)
 
-        pygame.display.flip()
+            pygame.display.flip()
 
-        for event in pygame.event.get():
+        for event in affichage.evenements():
             if event.type == pygame.QUIT:
                 return None, None
             if event.type == pygame.KEYDOWN:
+                affichage.invalider()
                 if event.key == pygame.K_UP:
                     index_selection = (index_selection - 1) % len(vaisseaux)
                 elif event.key == pygame.K_DOWN:
@@ -379,187 +1062,147 @@ def menu_selection_vaisseau():
                 elif event.key == pygame.K_SPACE:
                     return vaisseaux[index_selection], pimpage
 
-# Fonction principale du jeu
-def jeu_principal(type_vaisseau, pimpage):
-    # Création des groupes de sprites
-    tous_sprites = pygame.sprite.Group()
-    ennemis = pygame.sprite.Group()
-    lasers = pygame.sprite.Group()
-    power_ups = pygame.sprite.Group()
-    asteroides = pygame.sprite.Group()
-    zones_danger = pygame.sprite.Group()
-
-    # Création du vaisseau du joueur
-    vaisseau = Vaisseau(type_vaisseau)
-    vaisseau.pimpage = pimpage
-    tous_sprites.add(vaisseau)
+# Une image de jeu, dessinée depuis une VueDirecte ou une VueJeu
+def dessiner_vue(vue, rendu):
+    rendu.effacer()
+    rendu.ajouter(vue.etoiles.dessiner(ecran, vue.alpha, rendu.zones_modifiees))
+    rendu.ajouter(dessiner_interpole(vue.sprites, ecran, vue.alpha))
+
+    # Affichage du score, du niveau et du bouclier
+    rendu.ajouter([
+        dessiner_texte(ecran, f"Score: {vue.score}", 18, 50, 10),
+        dessiner_texte(ecran, f"Niveau: {vue.niveau}", 18, LARGEUR // 2, 10),
+        dessiner_texte(ecran, f"Bouclier: {vue.bouclier}", 18, LARGEUR - 70, 10),
+        dessiner_texte(ecran, f"Ressources: {vue.ressources}", 18, LARGEUR - 70, 30),
+    ])
+
+    # Affichage de la mission actuelle
+    if vue.mission:
+        rendu.ajouter([dessiner_texte(ecran, vue.mission, 18, LARGEUR // 2, HAUTEUR - 30)])
+
+# Fonction principale du jeu : lit le clavier, fait avancer EtatJeu à pas fixe et dessine.
+# En pipeline, le lot de pas de l'image N+1 tourne sur un autre fil pendant que
+# l'image N est dessinée et affichée depuis sa VueJeu ; les événements ne sont
+# lus qu'entre deux lots, quand ce fil ne touche pas à la partie.
+def jeu_principal(type_vaisseau, pimpage, fps_affichage=60, zones_modifiees=RENDU_ZONES_MODIFIEES,
+                  graine=None, journal=JOURNAL_PARTIE, profileur=None, pipeline=JEU_EN_PIPELINE):
+    images.precharger()
+    if profileur is None:
+        profileur = FrameProfiler(EXPORT_PROFILAGE)
+    # Les mesures du fil de la logique passent par une copie du profileur
+    profileur_logique = profileur.fork() if pipeline else profileur
+    enregistreur = None
+    if journal:
+        # Le journal doit connaître la graine pour que le rejeu retrouve la partie
+        if graine is None:
+            graine = random.getrandbits(64)
+        try:
+            os.makedirs(os.path.dirname(journal) or '.', exist_ok=True)
+            enregistreur = EnregistreurPartie(journal, type_vaisseau, pimpage, graine)
+        except OSError:
+            pass  # cache en lecture seule : la partie se joue sans journal
+    etat = EtatJeu(type_vaisseau, pimpage, graine, profileur_logique)
 
     # Création des étoiles
-    etoiles = pygame.sprite.Group()
-    for _ in range(100):
-        etoile = Etoile()
-        tous_sprites.add(etoile)
-        etoiles.add(etoile)
-
-    # Variables du jeu
-    score = 0
-    niveau = 1
-    ressources = 0
-    boss = None
-    missions = [
-        Mission("Détruire 10 ennemis", 10, 50),
-        Mission("Collecter 5 power-ups", 5, 100),
-        Mission("Survivre 60 secondes", 60, 150)
-    ]
-    mission_actuelle = missions[0]
-    temps_debut = pygame.time.get_ticks()
+    etoiles = ChampEtoiles()
+    # Sans pipeline, on dessine directement depuis l'état : pas de copie par image
+    vue_directe = None if pipeline else VueDirecte(etat, etoiles)
+
+    # Logique à pas fixe : autant de pas que le temps écoulé en demande. Les
+    # touches maintenues sont lues une fois par image, les ponctuelles ne
+    # valent que pour le premier pas.
+    def avancer(lot):
+        nombre, maintenues, ponctuelles, alpha = lot
+        with profileur_logique.scope('logique'):
+            for _ in range(nombre):
+                memoriser_positions(etat.tous_sprites)
+                actions = maintenues | ponctuelles
+                etat.pas(actions)
+                if enregistreur:
+                    enregistreur.ajouter(actions)
+                ponctuelles = 0
+                etoiles.update()
+                if etat.termine:
+                    break
+        if vue_directe is None:
+            return VueJeu(etat, etoiles, alpha)
+        vue_directe.alpha = alpha
+        return vue_directe
 
     # Boucle principale du jeu
+    rendu = RenduEcran(ecran, zones_modifiees)
     horloge = pygame.time.Clock()
+    pas_fixe = FixedTimestep(FREQUENCE_LOGIQUE, PAS_RATTRAPAGE_MAX)
+    logique = None
+    if pipeline:
+        logique = FramePipeline(avancer, 'logique')
+        logique.submit((pas_fixe.advance(), lire_actions_clavier(), 0, pas_fixe.alpha))
+    # Touches appuyées depuis le dernier pas, appliquées au suivant
+    actions_ponctuelles = 0
     en_cours = True
-    while en_cours:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                en_cours = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    laser = vaisseau.tirer()
-                    tous_sprites.add(laser)
-                    lasers.add(laser)
-                elif event.key == pygame.K_b:
-                    vaisseau.utiliser_bouclier()
-                elif event.key == pygame.K_n:
-                    if vaisseau.utiliser_explosion():
-                        for ennemi in ennemis:
-                            ennemi.vie = 0
-
-        # Mise à jour
-        tous_sprites.update()
-
-        # Génération d'ennemis
-        if len(ennemis) < 5 + niveau and random.random() < 0.02:
-            ennemi = Ennemi(niveau)
-            tous_sprites.add(ennemi)
-            ennemis.add(ennemi)
-
-        # Génération de power-ups
-        if random.random() < 0.005:
-            power_up = PowerUp()
-            tous_sprites.add(power_up)
-            power_ups.add(power_up)
-
-        # Génération d'astéroïdes
-        if random.random() < 0.01:
-            asteroide = Asteroide()
-            tous_sprites.add(asteroide)
-            asteroides.add(asteroide)
-
-        # Génération de zones de danger
-        if random.random() < 0.002:
-            zone_danger = ZoneDanger()
-            tous_sprites.add(zone_danger)
-            zones_danger.add(zone_danger)
-
-        # Collisions laser-ennemi
-        for laser in lasers:
-            ennemis_touches = pygame.sprite.spritecollide(laser, ennemis, False)
-            for ennemi in ennemis_touches:
-                ennemi.vie -= laser.puissance
-                if ennemi.vie <= 0:
-                    score += vaisseau.calculer_score(10 * ennemi.niveau)
-                    vaisseau.gagner_xp(5 * ennemi.niveau)
-                    ennemi.kill()
-                    vaisseau.incrementer_combo()
-                    mission_actuelle.mettre_a_jour("Détruire")
-                laser.kill()
-
-        # Collisions vaisseau-ennemi
-        ennemis_touches = pygame.sprite.spritecollide(vaisseau, ennemis, True)
-        for ennemi in ennemis_touches:
-            vaisseau.bouclier -= 20
-            if vaisseau.bouclier <= 0:
-                en_cours = False
-
-        # Collisions vaisseau-power-up
-        power_ups_touches = pygame.sprite.spritecollide(vaisseau, power_ups, True)
-        for power_up in power_ups_touches:
-            if power_up.type == 'bouclier':
-                vaisseau.bouclier = min(vaisseau.bouclier + 50, 100)
-            elif power_up.type == 'vitesse':
-                vaisseau.vitesse += 1
-            elif power_up.type == 'tir_multiple':
-                vaisseau.type_laser = 'rapide'
-            mission_actuelle.mettre_a_jour("Collecter")
-
-        # Collisions vaisseau-astéroïde
-        asteroides_touches = pygame.sprite.spritecollide(vaisseau, asteroides, True)
-        for asteroide in asteroides_touches:
-            ressources += asteroide.ressources
-
-        # Dégâts des zones de danger
-        if pygame.sprite.spritecollide(vaisseau, zones_danger, False):
-            vaisseau.bouclier -= 0.1
-
-        # Gestion du boss
-        if boss:
-            lasers_boss = boss.tirer()
-            for laser in lasers_boss:
-                tous_sprites.add(laser)
-                lasers.add(laser)
-
-            if pygame.sprite.collide_rect(vaisseau, boss):
-                vaisseau.bouclier -= 1
-
-            boss_touche = pygame.sprite.spritecollide(boss, lasers, True)
-            for laser in boss_touche:
-                boss.vie -= laser.puissance
-                if boss.vie <= 0:
-                    score += 1000 * niveau
-                    boss = None
-                    niveau += 1
-
-        # Vérification de la mission actuelle
-        if mission_actuelle.est_complete():
-            score += mission_actuelle.recompense
-            missions.remove(mission_actuelle)
-            if missions:
-                mission_actuelle = random.choice(missions)
-            else:
-                mission_actuelle = None
-
-        # Mise à jour du temps pour la mission de survie
-        temps_ecoule = (pygame.time.get_ticks() - temps_debut) // 1000
-        if mission_actuelle and mission_actuelle.description.startswith("Survivre"):
-            mission_actuelle.progres = temps_ecoule
-
-        # Apparition du boss
-        if score >= niveau * 1000 and not boss:
-            boss = Boss(niveau)
-            tous_sprites.add(boss)
-
-        # Dessin
-        ecran.fill(NOIR)
-        tous_sprites.draw(ecran)
-
-        # Affichage du score, du niveau et du bouclier
-        dessiner_texte(ecran, f"Score: {score}", 18, 50, 10)
-        dessiner_texte(ecran, f"Niveau: {niveau}", 18, LARGEUR // 2, 10)
-        dessiner_texte(ecran, f"Bouclier: {int(vaisseau.bouclier)}", 18, LARGEUR - 70, 10)
-        dessiner_texte(ecran, f"Ressources: {ressources}", 18, LARGEUR - 70, 30)
-
-        # Affichage de la mission actuelle
-        if mission_actuelle:
-            dessiner_texte(ecran,
-                           f"Mission: {mission_actuelle.description} ({mission_actuelle.progres}/{mission_actuelle.objectif})",
-                           18, LARGEUR // 2, HAUTEUR - 30)
-
-        pygame.display.flip()
-        horloge.tick(60)
-
-    return score
+    try:
+        while en_cours:
+            if logique:
+                with profileur.scope('attente'):
+                    vue = logique.collect()
+                profileur.merge(profileur_logique)
+                en_cours = not vue.termine
+
+            with profileur.scope('entrees'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        en_cours = False
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_SPACE:
+                            actions_ponctuelles |= ACTION_TIR
+                        elif event.key == pygame.K_b:
+                            actions_ponctuelles |= ACTION_BOUCLIER
+                        elif event.key == pygame.K_n:
+                            actions_ponctuelles |= ACTION_EXPLOSION
+                        elif event.key == pygame.K_F3:
+                            profileur.toggle_overlay()
+
+            nombre = pas_fixe.advance() if en_cours else 0
+            lot = (nombre, lire_actions_clavier(), actions_ponctuelles, pas_fixe.alpha)
+            if nombre:
+                actions_ponctuelles = 0
+            if not logique:
+                vue = avancer(lot)
+                en_cours = en_cours and not vue.termine
+            elif en_cours:
+                logique.submit(lot)
+
+            # Dessin
+            with profileur.scope('dessin'):
+                dessiner_vue(vue, rendu)
+
+            # Compteurs et surimpression du profilage
+            if profileur.enabled:
+                for nom, valeur in vue.compteurs.items():
+                    profileur.count(nom, valeur)
+                surimpression = profileur.draw(ecran, (10, 50))
+                if surimpression:
+                    rendu.ajouter([surimpression])
+
+            with profileur.scope('affichage'):
+                rendu.presenter()
+            profileur.end_frame()
+            horloge.tick(fps_affichage)
+    finally:
+        # L'export du profilage est fermé même si la partie s'arrête sur une erreur
+        try:
+            if logique:
+                logique.close()
+        finally:
+            profileur.close()
+
+    if enregistreur:
+        enregistreur.fermer(etat.score)
+    return etat.score
 
 # Boucle principale du programme
 if __name__ == "__main__":
+    ouvrir_ecran()
     while True:
         choix = menu_principal()
         if choix == "commencer":
@@ -575,4 +1218,4 @@ if __name__ == "__main__":
         elif choix == "quitter":
             break
 
-pygame.quit()
+    pygame.quit()
@@ -1,16 +1,43 @@
+# startup first: off Linux, elapsed_ms counts from its import
+import startup
+
 import pygame
 import pygame.freetype
 import math
-import random
+from collections import OrderedDict
+
+import numpy as np
+
+from fixed_timestep import FixedTimestep
+from frame_pipeline import FramePipeline
+from frame_profiler import FrameProfiler
 
-# Initialize Pygame
-pygame.init()
-pygame.freetype.init()
+# Pygame subsystems are started by open_screen, only the ones in use: importing
+# this module (as the particle workers do) initializes nothing
 
 # Set up the display
 WIDTH, HEIGHT = 1200, 800
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Enhanced Infinity Particle Simulation")
+TOOLBAR_HEIGHT = 60
+screen = None
+
+# Simulation steps per second, independent of the redraw rate
+LOGIC_RATE = 60
+MAX_CATCH_UP_STEPS = 5
+
+# Startup: the initial particles are spawned over this many steps so the first
+# frame shows at once, and the time to that frame is reported against a target
+STARTUP_STREAM_STEPS = 10
+FIRST_FRAME_TARGET_MS = 1000
+
+# Share of the trail brightness kept from one frame to the next (F4 toggles trails)
+TRAIL_DECAY = 0.85
+
+# Step the particles on a worker thread while the previous frame is drawn and
+# flipped; the screen then shows the simulation one frame late
+PIPELINED = False
+
+# Per-frame metrics file (.jsonl or .csv); F3 shows the profiling overlay either way
+PROFILE_EXPORT = None
 
 # Colors
 BLACK = (0, 0, 0)
@@ -24,75 +51,513 @@ METAL_COLORS = [
     (212, 175, 55),  # Brass
 ]
 
-# Fonts
-font = pygame.freetype.SysFont("Arial", 24)
-large_font = pygame.freetype.SysFont("Arial", 36)
+# Fonts, loaded by open_screen
+font = None
+large_font = None
+
+CONTROLS_TEXT = [
+    "Controls:",
+    "- Type text and press Enter to create text particles",
+    "- Toggle wind effect with the button",
+    "- Use Config Panel to adjust simulation parameters",
+    "- Click anywhere to interact with particles",
+    "- F3: profiling overlay, F4: motion trails"
+]
 
 
-class Particle:
-    def __init__(self, x, y, color):
-        self.x = self.original_x = x
-        self.y = self.original_y = y
-        self.size = random.uniform(1, 2)
-        self.color = color
-        self.speed = random.uniform(0.1, 0.5)
-        self.wind_force = self.wind_angle = 0
-        self.in_text = False
-        self.target_x = self.target_y = None
-        self.t = random.uniform(0, 4000)
-        self.wild = random.random() < 0.001  # 0.1% chance of going wild
-        self.wild_direction = random.uniform(0, 2 * math.pi)
-        self.wild_speed = random.uniform(2, 5)
-        self.life = 255 if self.wild else None
+def open_screen(offscreen=False):
+    """Create the surface everything draws to.
+
+    ``offscreen`` renders into a plain Surface with no window at all; for a
+    headless window use the SDL dummy video driver instead, which keeps flips.
+    """
+    global screen
+    if offscreen:
+        # Mouse queries still work where a video driver exists, as after pygame.init()
+        try:
+            pygame.display.init()
+        except pygame.error:
+            pass
+        screen = pygame.Surface((WIDTH, HEIGHT))
+    else:
+        pygame.display.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Enhanced Infinity Particle Simulation")
+    load_fonts()
+    return screen
+
+
+def load_fonts():
+    """Open the UI fonts; the font file is looked up through startup's on-disk cache."""
+    global font, large_font
+    if font is None:
+        pygame.freetype.init()
+        path = startup.match_font("Arial")
+        font = pygame.freetype.Font(path, 24)
+        large_font = pygame.freetype.Font(path, 36)
+
+
+class ParticleSystem:
+    """Fixed-capacity structure-of-arrays particle pool advanced with batched NumPy operations.
+
+    Every per-particle attribute lives in its own preallocated array. Slots are
+    handed out from a free-list stack and culling only clears ``alive`` and
+    pushes the slot back, so a running simulation never allocates particles.
+    Kernels run over the first ``end`` slots (the high-water mark); dead slots
+    in that range are parked as plain orbit particles and are never drawn.
+    The wind angle is kept as its unit vector (``wind_cos``/``wind_sin``) so
+    the per-frame step needs no ``atan2``. ``prev_x``/``prev_y`` hold the
+    positions before the last step, for drawing between steps.
+    """
+
+    FLOAT_FIELDS = ("x", "y", "size", "speed", "t", "wind_force", "wind_cos", "wind_sin",
+                    "target_x", "target_y", "wild_dx", "wild_dy", "life", "jitter_x", "jitter_y",
+                    "prev_x", "prev_y")
+    BOOL_FIELDS = ("alive", "in_text", "wild")
+    FIELDS = tuple((name, np.float32) for name in FLOAT_FIELDS) + \
+        tuple((name, np.bool_) for name in BOOL_FIELDS) + (("color", np.uint8),)
+
+    def __init__(self, capacity=100000, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.capacity = capacity
+        self.end = 0
+        for name, dtype in self.FIELDS:
+            setattr(self, name, self._new_array(name, dtype))
+        # Stack of free slots, top at free[free_count - 1]; lowest slots go first
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.intp)
+        self.free_count = capacity
+
+    def _new_array(self, name, dtype):
+        return np.zeros(self.capacity, dtype=dtype)
+
+    def __len__(self):
+        return self.capacity - self.free_count
+
+    def spawn(self, n, x, y, color_index):
+        """Place up to ``n`` particles at ``x``/``y`` (scalars or arrays) in free slots.
+
+        Returns the slot indices used; fewer than ``n`` when the pool is full.
+        """
+        n = min(n, self.free_count)
+        idx = self.free[self.free_count - n:self.free_count][::-1].copy()
+        self.free_count -= n
+        if n == 0:
+            return idx
+        self.end = max(self.end, int(idx.max()) + 1)
+        rng = self.rng
+        self.alive[idx] = True
+        self.x[idx] = x if np.ndim(x) == 0 else x[:n]
+        self.y[idx] = y if np.ndim(y) == 0 else y[:n]
+        self.prev_x[idx] = self.x[idx]
+        self.prev_y[idx] = self.y[idx]
+        self.size[idx] = rng.uniform(1, 2, n)
+        self.color[idx] = color_index
+        self.speed[idx] = rng.uniform(0.1, 0.5, n)
+        self.wind_force[idx] = 0
+        self.wind_cos[idx] = 1
+        self.wind_sin[idx] = 0
+        self.in_text[idx] = False
+        self.target_x[idx] = 0
+        self.target_y[idx] = 0
+        self.t[idx] = rng.uniform(0, 4000, n)
+        self.wild[idx] = rng.random(n) < 0.001  # 0.1% chance of going wild
+        wild_direction = rng.uniform(0, 2 * math.pi, n)
+        wild_speed = rng.uniform(2, 5, n)
+        self.wild_dx[idx] = np.cos(wild_direction) * wild_speed
+        self.wild_dy[idx] = np.sin(wild_direction) * wild_speed
+        self.life[idx] = 255
+        return idx
+
+    def spawn_random(self, n, color_index):
+        return self.spawn(n, self.rng.integers(0, WIDTH, n, endpoint=True),
+                          self.rng.integers(0, HEIGHT, n, endpoint=True), color_index)
+
+    def kill(self, idx):
+        """Return the given live slots to the free-list."""
+        self.alive[idx] = False
+        self.wild[idx] = False
+        self.in_text[idx] = False
+        self.wind_force[idx] = 0
+        self.free[self.free_count:self.free_count + len(idx)] = idx
+        self.free_count += len(idx)
+
+    def release_text(self):
+        self.kill(np.flatnonzero(self.in_text[:self.end]))
+
+    def assign_text_targets(self, target_x, target_y, color_index):
+        """Send particles towards the given targets, newest first, spawning any shortfall.
+
+        Targets beyond what the pool can hold are left empty.
+        """
+        k = len(target_x)
+        candidates = np.flatnonzero(self.alive[:self.end] & ~self.in_text[:self.end])
+        reused = candidates[len(candidates) - min(k, len(candidates)):]
+        spawned = self.spawn(k - len(reused), WIDTH // 2, HEIGHT // 3, color_index)
+        idx = np.concatenate((spawned, reused))
+        self.target_x[idx] = target_x[:len(idx)]
+        self.target_y[idx] = target_y[:len(idx)]
+        self.in_text[idx] = True
 
     def update(self, mouse_pos, wind_effect, wind_strength, particle_speed):
-        if self.wild:
-            self.x += math.cos(self.wild_direction) * self.wild_speed
-            self.y += math.sin(self.wild_direction) * self.wild_speed
-            self.life -= 2
-            if self.life <= 0 or self.x < 0 or self.x > WIDTH or self.y < 0 or self.y > HEIGHT:
-                return False
-        elif self.in_text:
-            self.move_to_text_position(wind_effect, wind_strength, particle_speed)
-        elif wind_effect and mouse_pos:
-            dx, dy = mouse_pos[0] - self.x, mouse_pos[1] - self.y
-            distance = math.hypot(dx, dy)
-            if distance < 150:
-                self.wind_force = max(0, 150 - distance) / 10 * wind_strength
-                self.wind_angle = math.atan2(dy, dx)
-            else:
-                self.wind_force *= 0.98
-            self.x += math.cos(self.wind_angle) * self.wind_force * particle_speed
-            self.y += math.sin(self.wind_angle) * self.wind_force * particle_speed
-
-        if not self.in_text and not self.wild:
-            self.t += 0.05 * particle_speed
-            self.original_x = WIDTH // 2 + 200 * math.sin(self.t)
-            self.original_y = HEIGHT // 3 + 100 * math.sin(self.t * 2)
-            self.x += (self.original_x - self.x) * 0.05 * particle_speed
-            self.y += (self.original_y - self.y) * 0.05 * particle_speed
-
-        return True
-
-    def move_to_text_position(self, wind_effect, wind_strength, particle_speed):
-        if self.target_x is not None and self.target_y is not None:
-            dx, dy = self.target_x - self.x, self.target_y - self.y
-            distance = math.hypot(dx, dy)
-            if distance > 1:
-                self.x += dx * 0.1 * particle_speed
-                self.y += dy * 0.1 * particle_speed
-            else:
-                self.x, self.y = self.target_x, self.target_y
-
-            if wind_effect:
-                self.x += random.uniform(-1, 1) * wind_strength
-                self.y += random.uniform(-1, 1) * wind_strength
+        n = self.end
+        if n == 0:
+            return
+        self._draw_text_jitter(n, wind_effect)
+        self.advance(0, n, mouse_pos, wind_effect, wind_strength, particle_speed)
+        self._cull_wild(n)
+
+    def _draw_text_jitter(self, n, wind_effect):
+        # Drawn up front, in slot order, so that the random stream does not
+        # depend on how the slots are later split between workers
+        if not wind_effect:
+            return
+        text = np.flatnonzero(self.in_text[:n] & ~self.wild[:n])
+        if text.size:
+            self.jitter_x[text] = self.rng.uniform(-1, 1, text.size)
+            self.jitter_y[text] = self.rng.uniform(-1, 1, text.size)
+
+    def advance(self, start, stop, mouse_pos, wind_effect, wind_strength, particle_speed):
+        """Move slots ``start:stop`` by one frame; culling is left to the caller.
+
+        Every slot only depends on its own state, so disjoint ranges can be
+        advanced independently.
+        """
+        x, y, t = self.x[start:stop], self.y[start:stop], self.t[start:stop]
+        wild = self.wild[start:stop]
+        in_text = self.in_text[start:stop]
+        self.prev_x[start:stop] = x
+        self.prev_y[start:stop] = y
+
+        # Wild and text particles are few: snapshot them, run the free-particle
+        # kernels over the whole slice, then put their own state back.
+        special = np.flatnonzero(in_text | wild)
+        saved = [(arr, arr[special]) for arr in (x, y, t, self.wind_force[start:stop],
+                                                 self.wind_cos[start:stop], self.wind_sin[start:stop])]
+
+        if wind_effect and mouse_pos:
+            self._apply_wind(start, stop, mouse_pos, wind_strength, particle_speed)
+
+        step = 0.05 * particle_speed
+        t += step
+        # Keep the phase in one period: a float32 phase that grows without
+        # bound loses the step to rounding and the orbit slows, then freezes
+        np.remainder(t, 2 * np.pi, out=t)
+        x += (WIDTH // 2 + 200 * np.sin(t) - x) * step
+        y += (HEIGHT // 3 + 100 * np.sin(t * 2) - y) * step
+
+        for arr, values in saved:
+            arr[special] = values
+
+        text = special[~wild[special]]
+        if text.size:
+            self._move_to_text_positions(text + start, wind_effect, wind_strength, particle_speed)
+
+        if wild.any():
+            idx = np.flatnonzero(wild) + start
+            self.x[idx] += self.wild_dx[idx]
+            self.y[idx] += self.wild_dy[idx]
+            self.life[idx] -= 2
+
+    def _cull_wild(self, n):
+        idx = np.flatnonzero(self.wild[:n])
+        if idx.size:
+            wx, wy = self.x[idx], self.y[idx]
+            dead = (self.life[idx] <= 0) | (wx < 0) | (wx > WIDTH) | (wy < 0) | (wy > HEIGHT)
+            if dead.any():
+                self.kill(idx[dead])
+
+    def _apply_wind(self, start, stop, mouse_pos, wind_strength, particle_speed):
+        x, y = self.x[start:stop], self.y[start:stop]
+        force = self.wind_force[start:stop]
+        wind_cos, wind_sin = self.wind_cos[start:stop], self.wind_sin[start:stop]
+
+        # Far particles only decay what is left of earlier gusts, in bulk
+        force *= 0.98
+
+        # Squared distances over the whole slice; the exact distance is only
+        # taken for the few particles inside the radius
+        dx = np.subtract(mouse_pos[0], x, dtype=np.float32)
+        dy = np.subtract(mouse_pos[1], y, dtype=np.float32)
+        d2 = dx * dx
+        d2 += np.square(dy)
+        near = np.flatnonzero(d2 < 150 * 150)
+        if near.size:
+            dx, dy = dx[near], dy[near]
+            d = np.hypot(dx, dy)
+            force[near] = (150 - d) / 10 * wind_strength
+            safe = np.where(d > 0, d, 1)
+            wind_cos[near] = np.where(d > 0, dx / safe, 1)
+            wind_sin[near] = dy / safe
+
+        # d2 is free again: reuse it for the push
+        push = np.multiply(force, np.float32(particle_speed), out=d2)
+        x += wind_cos * push
+        push *= wind_sin
+        y += push
+
+    def _move_to_text_positions(self, idx, wind_effect, wind_strength, particle_speed):
+        x, y = self.x[idx], self.y[idx]
+        tx, ty = self.target_x[idx], self.target_y[idx]
+        dx, dy = tx - x, ty - y
+        far = np.hypot(dx, dy) > 1
+        x = np.where(far, x + dx * 0.1 * particle_speed, tx)
+        y = np.where(far, y + dy * 0.1 * particle_speed, ty)
+        if wind_effect:
+            x += self.jitter_x[idx] * wind_strength
+            y += self.jitter_y[idx] * wind_strength
+        self.x[idx] = x
+        self.y[idx] = y
+
+
+class ParticleSnapshot:
+    """The arrays the renderer reads, copied from a ParticleSystem at the end of a pipelined batch.
+
+    A frame is drawn from a snapshot while the worker thread steps the live
+    system on. The arrays are allocated at full capacity once and only the
+    first ``end`` slots are copied.
+    """
+
+    FIELDS = ("x", "y", "prev_x", "prev_y", "size", "color", "alive")
+
+    def __init__(self, capacity):
+        dtypes = dict(ParticleSystem.FIELDS)
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=dtypes[name]))
+        self.end = 0
+        self.count = 0
+        self.steps = 0
+        self.alpha = 1.0
+
+    def capture(self, particles):
+        end = particles.end
+        for name in self.FIELDS:
+            np.copyto(getattr(self, name)[:end], getattr(particles, name)[:end])
+        self.end = end
+        self.count = len(particles)
+        return self
+
+
+class GlyphCache:
+    """LRU cache of per-glyph point clouds keyed by (font, size, char).
+
+    A glyph is stored as the coordinates of its lit pixels relative to the pen
+    position on the baseline, plus its advance, so any string can be assembled
+    from cached glyphs without rasterizing it again.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._glyphs = OrderedDict()
+
+    def __len__(self):
+        return len(self._glyphs)
+
+    def glyph(self, font, char):
+        key = (font.path, font.size, char)
+        glyph = self._glyphs.get(key)
+        if glyph is not None:
+            self._glyphs.move_to_end(key)
+            return glyph
+        surface, rect = font.render(char, WHITE)
+        if surface.get_width() and surface.get_height():
+            xs, ys = np.nonzero(pygame.surfarray.array_alpha(surface))
+        else:
+            xs = ys = np.zeros(0, dtype=np.intp)
+        metrics = font.get_metrics(char)[0]
+        advance = metrics[4] if metrics else rect.width
+        glyph = (xs + rect.x, ys - rect.y, advance)
+        self._glyphs[key] = glyph
+        if len(self._glyphs) > self.maxsize:
+            self._glyphs.popitem(last=False)
+        return glyph
+
+    def text_points(self, font, text):
+        """Return the lit pixels of ``text`` relative to the top-left of its bounding box, and its width."""
+        rect = font.get_rect(text)
+        xs, ys = [], []
+        pen = 0.0
+        for char in text:
+            gx, gy, advance = self.glyph(font, char)
+            xs.append(gx + int(round(pen)))
+            ys.append(gy)
+            pen += advance
+        if not xs:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), rect.width
+        return np.concatenate(xs) - rect.x, np.concatenate(ys) + rect.y, rect.width
+
+
+class ParticleRenderer:
+    """Writes a whole ParticleSystem into a surface with a few array operations.
+
+    Each body and shine circle radius is baked once into a stamp of pixel
+    offsets taken from ``pygame.draw.circle`` itself, so the bulk scatter through
+    ``pixels2d`` lights exactly the pixels the per-particle calls used to.
+    """
 
-    def draw(self):
-        color = self.color if not self.wild else (*self.color[:3], self.life)
-        pygame.draw.circle(screen, color, (int(self.x), int(self.y)), int(self.size))
-        shine_pos = (int(self.x + self.size / 2), int(self.y - self.size / 2))
-        pygame.draw.circle(screen, WHITE, shine_pos, int(self.size / 3))
+    def __init__(self):
+        self._stamps = {}
+
+    def _stamp(self, radius):
+        if radius not in self._stamps:
+            side = 2 * radius + 3
+            stamp = pygame.Surface((side, side))
+            pygame.draw.circle(stamp, WHITE, (radius + 1, radius + 1), radius)
+            ox, oy = np.nonzero(pygame.surfarray.array2d(stamp))
+            self._stamps[radius] = (ox - radius - 1, oy - radius - 1)
+        return self._stamps[radius]
+
+    @staticmethod
+    def positions(particles, alpha=1.0):
+        """Slots of the live particles and where they are ``alpha`` of the way through the step."""
+        live = np.flatnonzero(particles.alive[:particles.end])
+        x, y = particles.x[live], particles.y[live]
+        if alpha < 1:
+            px, py = particles.prev_x[live], particles.prev_y[live]
+            x = px + (x - px) * np.float32(alpha)
+            y = py + (y - py) * np.float32(alpha)
+        return live, x, y
+
+    def draw(self, surface, particles, alpha=1.0):
+        """Draw the live particles ``alpha`` of the way from their previous to current positions."""
+        live, x, y = self.positions(particles, alpha)
+        if live.size == 0:
+            return
+        size, color = particles.size[live], particles.color[live]
+        if surface.get_bytesize() != 4:
+            self._draw_circles(surface, x, y, size, color)
+            return
+        palette = np.array([surface.map_rgb(color) for color in METAL_COLORS], dtype=np.uint32)
+        pixels = pygame.surfarray.pixels2d(surface)
+        # pixels2d is indexed [x, y]; its transpose is row-major so stamps can be
+        # scattered through flat offsets when the surface rows have no padding.
+        rows = pixels.T
+        flat = rows.reshape(-1) if rows.flags.c_contiguous else None
+        self._scatter(pixels, flat, x.astype(np.intp), y.astype(np.intp), size.astype(np.intp),
+                      palette[color])
+        self._scatter(pixels, flat, (x + size / 2).astype(np.intp), (y - size / 2).astype(np.intp),
+                      (size / 3).astype(np.intp), np.uint32(surface.map_rgb(WHITE)))
+        del pixels, rows, flat  # release the surface lock before blitting the UI
+
+    def _scatter(self, pixels, flat, px, py, radius, colors):
+        width, height = pixels.shape
+        colors = np.broadcast_to(colors, px.shape)
+        for r in range(1, int(radius.max()) + 1):
+            sel = radius == r
+            xs, ys, values = (px, py, colors) if sel.all() else (px[sel], py[sel], colors[sel])
+            if xs.size == 0:
+                continue
+            ox, oy = self._stamp(r)
+            offsets = list(zip(ox.tolist(), oy.tolist()))
+            if flat is not None:
+                inside = (xs >= r) & (xs + r < width) & (ys >= r) & (ys + r < height)
+                base = (ys * width + xs)[inside]
+                inside_values = values[inside]
+                for dx, dy in offsets:
+                    flat[base + (dy * width + dx)] = inside_values
+                outside = ~inside
+                xs, ys, values = xs[outside], ys[outside], values[outside]
+            for dx, dy in offsets:
+                sx, sy = xs + dx, ys + dy
+                ok = (sx >= 0) & (sx < width) & (sy >= 0) & (sy < height)
+                pixels[sx[ok], sy[ok]] = values[ok]
+
+    def _draw_circles(self, surface, xs, ys, sizes, colors):
+        for x, y, size, color in zip(xs.tolist(), ys.tolist(), sizes.tolist(), colors.tolist()):
+            pygame.draw.circle(surface, METAL_COLORS[color], (int(x), int(y)), int(size))
+            shine_pos = (int(x + size / 2), int(y - size / 2))
+            pygame.draw.circle(surface, WHITE, shine_pos, int(size / 3))
+
+
+class TrailBuffer:
+    """Glowing motion trails: a persistent layer that fades and gathers particle colors.
+
+    Each frame the layer is multiplied by ``decay`` and every particle adds a
+    share ``gain`` of its metal color to its pixel, saturating at white.
+    :meth:`draw` then stands in for clearing the screen. The layer is
+    ``downscale`` times smaller than the screen on each side: the fade is two
+    whole-layer blits that pygame runs with SIMD (a blended ``fill`` takes the
+    slow per-pixel path), and the scale-up writes the screen in one pass. The
+    particles are one gather and one scatter through ``pixels2d``; particles
+    sharing a layer pixel add a single share.
+    """
+
+    def __init__(self, size, decay=0.85, gain=0.35, downscale=2):
+        self.downscale = downscale
+        size = (-(-size[0] // downscale), -(-size[1] // downscale))
+        self.surface = pygame.Surface(size, 0, 32)
+        self.decay = decay
+        # Each color's share as the bytes of a pixel word, widened to 16 bits
+        # so the sum can be clipped and packed in one 64-bit word per color
+        # (a 1-D gather); the unused byte adds 0 and stays as it was
+        shares = [self.surface.map_rgb([int(c * gain) for c in color]) for color in METAL_COLORS]
+        bytes_ = np.array(shares, dtype=np.uint32).view(np.uint8).astype(np.uint16)
+        self.palette = bytes_.view(np.uint64)
+        self._fade = pygame.Surface(size, 0, 32)
+        self._fade_level = None
+        # BLEND_RGB_MULT rounds up, so small values would never reach black
+        # without this extra -1 per frame
+        self._floor = pygame.Surface(size, 0, 32)
+        self._floor.fill((1, 1, 1))
+
+    def clear(self):
+        self.surface.fill(BLACK)
+
+    def update(self, x, y, color):
+        level = round(self.decay * 255)
+        if level != self._fade_level:
+            self._fade.fill((level, level, level))
+            self._fade_level = level
+        self.surface.blit(self._fade, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        self.surface.blit(self._floor, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+
+        width, height = self.surface.get_size()
+        scale = np.float32(1 / self.downscale)
+        xs, ys = (x * scale).astype(np.intp), (y * scale).astype(np.intp)
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        if not inside.any():
+            return
+        xs, ys = xs[inside], ys[inside]
+        pixels = pygame.surfarray.pixels2d(self.surface)
+        current = pixels[xs, ys].view(np.uint8).reshape(-1, 4)
+        share = self.palette[color[inside]].view(np.uint16).reshape(-1, 4)
+        lit = np.minimum(current + share, 255).astype(np.uint8)
+        pixels[xs, ys] = lit.view(np.uint32).ravel()
+        del pixels  # unlock before the blit
+
+    def draw(self, target):
+        """Cover ``target`` with the layer, scaled up to its size."""
+        if target.get_bitsize() == self.surface.get_bitsize():
+            pygame.transform.scale(self.surface, target.get_size(), target)
+        else:
+            target.blit(pygame.transform.scale(self.surface, target.get_size()), (0, 0))
+
+
+class CachedLayer:
+    """Off-screen surface that is re-rendered only when its key changes.
+
+    ``render(surface)`` draws the layer in its own coordinates. Callers pass a
+    key holding everything the picture depends on to :meth:`get`, so an
+    unchanged widget costs one blit per frame instead of fills and text renders.
+    """
+
+    _STALE = object()
+
+    def __init__(self, size, render, alpha=True):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA if alpha else 0)
+        self.render = render
+        self.key = self._STALE
+        self.renders = 0
+
+    def get(self, key=()):
+        if key != self.key:
+            self.surface.fill((0, 0, 0, 0))
+            self.render(self.surface)
+            self.key = key
+            self.renders += 1
+        return self.surface
+
+    def invalidate(self):
+        self.key = self._STALE
 
 
 class Button:
@@ -102,10 +567,17 @@ class Button:
         self.color = color
         self.text_color = text_color
         self.action = action
+        self.layer = CachedLayer(self.rect.size, self._render, alpha=False)
 
-    def draw(self):
-        pygame.draw.rect(screen, self.color, self.rect)
-        font.render_to(screen, (self.rect.x + 10, self.rect.y + 10), self.text, self.text_color)
+    def _render(self, surface):
+        surface.fill(self.color)
+        font.render_to(surface, (10, 10), self.text, self.text_color)
+
+    def image(self):
+        return self.layer.get((self.text, self.color, self.text_color))
+
+    def draw(self, surface=None, offset=(0, 0)):
+        (surface or screen).blit(self.image(), self.rect.move(offset))
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.rect.collidepoint(event.pos):
@@ -120,12 +592,22 @@ class Slider:
         self.value = initial_value
         self.label = label
         self.dragging = False
+        # The layer spans the track, the knob overhanging either end and the label above
+        label_width = max(font.get_rect(f"{label}: {value:.2f}").width for value in (min_value, max_value))
+        self.area = pygame.Rect(x - 5, y - 30, max(width + 10, label_width + 10), height + 30)
+        self.layer = CachedLayer(self.area.size, self._render)
+
+    def _knob_offset(self):
+        return int((self.value - self.min_value) / (self.max_value - self.min_value) * self.rect.width)
+
+    def _render(self, surface):
+        track = self.rect.move(-self.area.x, -self.area.y)
+        pygame.draw.rect(surface, GRAY, track)
+        pygame.draw.rect(surface, WHITE, (track.x + self._knob_offset() - 5, track.y, 10, track.height))
+        font.render_to(surface, (track.x, track.y - 30), f"{self.label}: {self.value:.2f}", WHITE)
 
     def draw(self):
-        pygame.draw.rect(screen, GRAY, self.rect)
-        pos = int((self.value - self.min_value) / (self.max_value - self.min_value) * self.rect.width)
-        pygame.draw.rect(screen, WHITE, (self.rect.x + pos - 5, self.rect.y, 10, self.rect.height))
-        font.render_to(screen, (self.rect.x, self.rect.y - 30), f"{self.label}: {self.value:.2f}", WHITE)
+        screen.blit(self.layer.get((self._knob_offset(), f"{self.value:.2f}")), self.area)
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -140,9 +622,18 @@ class Slider:
 
 
 class Simulation:
-    def __init__(self):
-        self.particles = []
-        self.text_particles = []
+    def __init__(self, seed=None, max_particles=100000, initial_particles=10000, particles=None, profiler=None,
+                 stream_steps=0, trails=False):
+        # ``particles`` swaps in another engine, e.g. particle_workers.ParallelParticleSystem
+        self.particles = particles if particles is not None else ParticleSystem(max_particles, seed=seed)
+        self.profiler = profiler if profiler is not None else FrameProfiler(PROFILE_EXPORT)
+        # Where the steps are timed: a fork of the profiler while they run on the pipeline's worker
+        self.step_profiler = self.profiler
+        self.initial_particles = initial_particles
+        # With stream_steps, the initial particles arrive over the first steps instead of all up front
+        self.stream_steps = stream_steps
+        self.pending_particles = 0
+        self.renderer = ParticleRenderer()
         self.wind_effect = True
         self.show_controls = False
         self.show_utility_panel = False
@@ -153,23 +644,35 @@ class Simulation:
         self.wind_strength = 1.0
         self.particle_speed = 1.0
         self.spawn_rate = 10
+        self.text_density = 1.0
+        self.glyph_cache = GlyphCache()
+        # Motion trails instead of a black clear, toggled with F4
+        self.trails = TrailBuffer(screen.get_size(), TRAIL_DECAY) if trails else None
         self.create_infinity_particles()
         self.create_ui()
+        self.create_layers()
 
     def create_infinity_particles(self):
-        self.particles = [Particle(random.randint(0, WIDTH), random.randint(0, HEIGHT), self.particle_color) for _ in
-                          range(10000)]
+        if self.stream_steps > 0:
+            self.pending_particles = self.initial_particles
+        else:
+            self.particles.spawn_random(self.initial_particles, METAL_COLORS.index(self.particle_color))
+
+    def stream_particles(self):
+        count = min(self.pending_particles, -(-self.initial_particles // self.stream_steps))
+        self.particles.spawn_random(count, METAL_COLORS.index(self.particle_color))
+        self.pending_particles -= count
 
     def create_ui(self):
-        toolbar_height = 60
-        self.input_box = pygame.Rect(10, HEIGHT - toolbar_height + 10, 300, 40)
-        self.wind_button = Button(WIDTH - 220, HEIGHT - toolbar_height + 10, 200, 40, "Toggle Wind", LIGHT_BLUE, BLACK,
+        self.input_box = pygame.Rect(10, HEIGHT - TOOLBAR_HEIGHT + 10, 300, 40)
+        button_y = HEIGHT - TOOLBAR_HEIGHT + 10
+        self.wind_button = Button(WIDTH - 220, button_y, 200, 40, "Toggle Wind", LIGHT_BLUE, BLACK,
                                   self.toggle_wind)
-        self.utility_button = Button(WIDTH - 440, HEIGHT - toolbar_height + 10, 200, 40, "Utility Panel", LIGHT_BLUE,
+        self.utility_button = Button(WIDTH - 440, button_y, 200, 40, "Utility Panel", LIGHT_BLUE,
                                      BLACK, self.toggle_utility_panel)
-        self.config_button = Button(WIDTH - 660, HEIGHT - toolbar_height + 10, 200, 40, "Config Panel", LIGHT_BLUE,
+        self.config_button = Button(WIDTH - 660, button_y, 200, 40, "Config Panel", LIGHT_BLUE,
                                     BLACK, self.toggle_config_panel)
-        self.controls_button = Button(WIDTH - 880, HEIGHT - toolbar_height + 10, 200, 40, "Show Controls", LIGHT_BLUE,
+        self.controls_button = Button(WIDTH - 880, button_y, 200, 40, "Show Controls", LIGHT_BLUE,
                                       BLACK, self.toggle_controls)
 
         self.wind_slider = Slider(WIDTH - 290, HEIGHT - 420, 200, 20, 0, 2, 1, "Wind Strength")
@@ -191,27 +694,26 @@ class Simulation:
         self.show_controls = not self.show_controls
 
     def create_text_particles(self):
-        text_surface, _ = large_font.render(self.input_text, WHITE)
-        text_array = pygame.surfarray.array3d(text_surface)
-        self.text_particles.clear()
-
-        for y in range(text_array.shape[1]):
-            for x in range(text_array.shape[0]):
-                if text_array[x][y].any():
-                    if self.particles:
-                        particle = self.particles.pop()
-                    else:
-                        particle = Particle(WIDTH // 2, HEIGHT // 3, self.particle_color)
-                    particle.target_x = x + (WIDTH - text_surface.get_width()) // 2
-                    particle.target_y = y + HEIGHT * 2 // 3
-                    particle.in_text = True
-                    self.text_particles.append(particle)
+        xs, ys, text_width = self.glyph_cache.text_points(large_font, self.input_text)
+        if self.text_density < 1:
+            keep = self.particles.rng.random(len(xs)) < self.text_density
+            xs, ys = xs[keep], ys[keep]
+        self.particles.release_text()
+        self.particles.assign_text_targets(xs + (WIDTH - text_width) // 2, ys + HEIGHT * 2 // 3,
+                                           METAL_COLORS.index(self.particle_color))
 
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle_overlay()
+                continue
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.toggle_trails()
+                continue
+
             for button in [self.wind_button, self.utility_button, self.config_button, self.controls_button]:
                 button.handle_event(event)
 
@@ -234,95 +736,163 @@ class Simulation:
 
         return True
 
-    def update(self):
-        mouse_pos = pygame.mouse.get_pos() if self.wind_effect else None
+    def update(self, mouse_pos=None):
+        if not self.wind_effect:
+            mouse_pos = None
+        elif mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
         self.wind_strength = self.wind_slider.value
         self.particle_speed = self.speed_slider.value
         self.spawn_rate = int(self.spawn_slider.value)
 
-        self.particles = [p for p in self.particles if
-                          p.update(mouse_pos, self.wind_effect, self.wind_strength, self.particle_speed)]
-        self.text_particles = [p for p in self.text_particles if
-                               p.update(mouse_pos, self.wind_effect, self.wind_strength, self.particle_speed)]
-
-        spawn_count = random.randint(1, self.spawn_rate)
-        for _ in range(spawn_count):
-            self.particles.append(Particle(random.randint(0, WIDTH), random.randint(0, HEIGHT), self.particle_color))
-
-    def draw(self):
-        screen.fill(BLACK)
-
-        for particle in self.particles + self.text_particles:
-            particle.draw()
-
-        pygame.draw.rect(screen, GRAY, (0, HEIGHT - 60, WIDTH, 60))
-
-        for button in [self.wind_button, self.utility_button, self.config_button, self.controls_button]:
-            button.draw()
-
-        pygame.draw.rect(screen, WHITE if self.input_active else GRAY, self.input_box, 2)
-        font.render_to(screen, (self.input_box.x + 5, self.input_box.y + 5), self.input_text, WHITE)
+        with self.step_profiler.scope("simulate"):
+            self.particles.update(mouse_pos, self.wind_effect, self.wind_strength, self.particle_speed)
+
+        with self.step_profiler.scope("spawn"):
+            if self.pending_particles:
+                self.stream_particles()
+            spawn_count = int(self.particles.rng.integers(1, self.spawn_rate, endpoint=True))
+            self.particles.spawn_random(spawn_count, METAL_COLORS.index(self.particle_color))
+
+    def advance_batch(self, job):
+        # Runs on the pipeline's worker: a frame's steps, then a snapshot to draw
+        steps, mouse_pos, alpha, snapshot = job
+        with self.step_profiler.scope("update"):
+            for _ in range(steps):
+                self.update(mouse_pos)
+        snapshot.capture(self.particles)
+        snapshot.steps = steps
+        snapshot.alpha = alpha
+        return snapshot
+
+    def create_layers(self):
+        # Retained UI: each panel is rendered once and re-rendered only when
+        # what it shows changes; the frame just blits them
+        self.toolbar_layer = CachedLayer((WIDTH, TOOLBAR_HEIGHT), self.render_toolbar, alpha=False)
+        self.utility_layer = CachedLayer((300, 400), self.render_utility_panel)
+        self.config_layer = CachedLayer((300, 400), self.render_config_panel)
+        # The help lines run past the right edge of their 400px backdrop
+        controls_width = max(400, 20 + max(font.get_rect(text).width for text in CONTROLS_TEXT))
+        self.controls_layer = CachedLayer((controls_width, 200), self.render_controls)
+
+    def toggle_trails(self):
+        if self.trails is None:
+            self.trails = TrailBuffer(screen.get_size(), TRAIL_DECAY)
+        else:
+            self.trails = None
+
+    def draw(self, alpha=1.0, particles=None):
+        # ``particles`` is a ParticleSnapshot when the steps run on the pipeline
+        if particles is None:
+            particles = self.particles
+        if self.trails is None:
+            screen.fill(BLACK)
+        else:
+            live, x, y = self.renderer.positions(particles, alpha)
+            self.trails.update(x, y, particles.color[live])
+            self.trails.draw(screen)
+
+        self.renderer.draw(screen, particles, alpha)
+
+        screen.blit(self.toolbar_layer.get((self.input_active, self.input_text)), (0, HEIGHT - TOOLBAR_HEIGHT))
 
         if self.show_utility_panel:
-            self.draw_utility_panel()
+            screen.blit(self.utility_layer.get(self.particle_color), (WIDTH - 310, HEIGHT - 470))
         if self.show_config_panel:
-            self.draw_config_panel()
+            screen.blit(self.config_layer.get(), (WIDTH - 310, HEIGHT - 470))
+            self.wind_slider.draw()
+            self.speed_slider.draw()
+            self.spawn_slider.draw()
         if self.show_controls:
-            self.draw_controls()
+            screen.blit(self.controls_layer.get(), (WIDTH // 2 - 200, HEIGHT // 2 - 100))
 
-        pygame.display.flip()
+    def render_toolbar(self, surface):
+        top = HEIGHT - TOOLBAR_HEIGHT
+        surface.fill(GRAY)
 
-    def draw_utility_panel(self):
-        panel_surface = pygame.Surface((300, 400), pygame.SRCALPHA)
-        panel_surface.fill((0, 0, 0, 192))
-        screen.blit(panel_surface, (WIDTH - 310, HEIGHT - 470))
+        for button in [self.wind_button, self.utility_button, self.config_button, self.controls_button]:
+            button.draw(surface, (0, -top))
 
-        font.render_to(screen, (WIDTH - 300, HEIGHT - 460), "Utility Panel", WHITE)
-        font.render_to(screen, (WIDTH - 300, HEIGHT - 420), "Particle Color:", WHITE)
+        input_box = self.input_box.move(0, -top)
+        pygame.draw.rect(surface, WHITE if self.input_active else GRAY, input_box, 2)
+        font.render_to(surface, (input_box.x + 5, input_box.y + 5), self.input_text, WHITE)
 
-        for i, color in enumerate(METAL_COLORS):
-            color_rect = pygame.Rect(WIDTH - 300 + i * 60, HEIGHT - 390, 50, 50)
-            pygame.draw.rect(screen, color, color_rect)
-            if color == self.particle_color:
-                pygame.draw.rect(screen, WHITE, color_rect, 2)
+    def render_utility_panel(self, surface):
+        surface.fill((0, 0, 0, 192))
 
-    def draw_config_panel(self):
-        panel_surface = pygame.Surface((300, 400), pygame.SRCALPHA)
-        panel_surface.fill((0, 0, 0, 192))
-        screen.blit(panel_surface, (WIDTH - 310, HEIGHT - 470))
+        font.render_to(surface, (10, 10), "Utility Panel", WHITE)
+        font.render_to(surface, (10, 50), "Particle Color:", WHITE)
 
-        font.render_to(screen, (WIDTH - 300, HEIGHT - 460), "Config Panel", WHITE)
+        for i, color in enumerate(METAL_COLORS):
+            color_rect = pygame.Rect(10 + i * 60, 80, 50, 50)
+            pygame.draw.rect(surface, color, color_rect)
+            if color == self.particle_color:
+                pygame.draw.rect(surface, WHITE, color_rect, 2)
 
-        self.wind_slider.draw()
-        self.speed_slider.draw()
-        self.spawn_slider.draw()
+    def render_config_panel(self, surface):
+        surface.fill((0, 0, 0, 192))
 
-    def draw_controls(self):
-        control_surface = pygame.Surface((400, 200), pygame.SRCALPHA)
-        control_surface.fill((0, 0, 0, 192))
-        screen.blit(control_surface, (WIDTH // 2 - 200, HEIGHT // 2 - 100))
+        font.render_to(surface, (10, 10), "Config Panel", WHITE)
 
-        controls = [
-            "Controls:",
-            "- Type text and press Enter to create text particles",
-            "- Toggle wind effect with the button",
-            "- Use Config Panel to adjust simulation parameters",
-            "- Click anywhere to interact with particles"
-        ]
+    def render_controls(self, surface):
+        surface.fill((0, 0, 0, 192), (0, 0, 400, 200))
 
-        for i, text in enumerate(controls):
-            font.render_to(screen, (WIDTH // 2 - 180, HEIGHT // 2 - 80 + i * 30), text, WHITE)
+        for i, text in enumerate(CONTROLS_TEXT):
+            font.render_to(surface, (20, 20 + i * 30), text, WHITE)
 
-    def run(self):
+    def run(self, fps=60, pipelined=PIPELINED):
+        # The simulation always steps at LOGIC_RATE; fps only caps the redraws
         clock = pygame.time.Clock()
+        timestep = FixedTimestep(LOGIC_RATE, MAX_CATCH_UP_STEPS)
+        profiler = self.profiler
+        pipeline = None
+        if pipelined:
+            # Frame N is drawn from a snapshot while the worker steps frame N+1
+            # into the other one. Events are handled only between collect and
+            # submit, while the worker is idle and the simulation is ours.
+            self.step_profiler = profiler.fork()
+            snapshots = [ParticleSnapshot(self.particles.capacity) for _ in range(2)]
+            pipeline = FramePipeline(self.advance_batch, "particles")
+            pipeline.submit((timestep.advance(), pygame.mouse.get_pos(), timestep.alpha, snapshots[1]))
         running = True
-        while running:
-            running = self.handle_events()
-            self.update()
-            self.draw()
-            clock.tick(60)
+        try:
+            while running:
+                if pipeline is not None:
+                    with profiler.scope("wait"):
+                        snapshot = pipeline.collect()
+                    profiler.merge(self.step_profiler)
+                with profiler.scope("input"):
+                    running = self.handle_events()
+                steps = timestep.advance()
+                if pipeline is None:
+                    with profiler.scope("update"):
+                        for _ in range(steps):
+                            self.update()
+                    particles, alpha, count = None, timestep.alpha, len(self.particles)
+                else:
+                    if running:
+                        spare = snapshots[snapshot is snapshots[0]]
+                        pipeline.submit((steps, pygame.mouse.get_pos(), timestep.alpha, spare))
+                    particles, alpha, count, steps = snapshot, snapshot.alpha, snapshot.count, snapshot.steps
+                with profiler.scope("draw"):
+                    self.draw(alpha, particles)
+                if profiler.enabled:
+                    profiler.count("particles", count)
+                    profiler.count("steps", steps)
+                    profiler.draw(screen)
+                with profiler.scope("flip"):
+                    pygame.display.flip()
+                startup.first_frame("Particle simulation", FIRST_FRAME_TARGET_MS)
+                profiler.end_frame()
+                clock.tick(fps)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+                self.step_profiler = profiler
+            profiler.close()
 
 
 if __name__ == "__main__":
-    simulation = Simulation()
+    open_screen()
+    simulation = Simulation(stream_steps=STARTUP_STREAM_STEPS)
     simulation.run()
@@ -0,0 +1,273 @@
+"""Headless benchmark for the particle simulation.
+
+Runs ``Simulation`` without a window and prints per-phase timings, FPS
+percentiles and peak memory as JSON, e.g.::
+
+    python bench_particules.py --particles 100000 --frames 600 --text Hello
+
+``--check-orbit`` instead runs the orbit from a phase reached after hours of
+uptime and checks it still follows a float64 reference; it exits non-zero
+when it does not. ``--compare-wind`` times the wind step against the plain
+masked brute-force version it replaced and checks both move the particles
+identically.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import ClaudeParticules as particules
+import particle_workers
+
+PHASES = ("events", "update", "draw", "flip")
+
+
+def scripted_mouse(frame):
+    # Sweep the cursor across both lobes of the infinity orbit
+    return (particules.WIDTH // 2 + 260 * math.cos(frame / 45),
+            particules.HEIGHT // 3 + 120 * math.sin(frame / 30))
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def run_benchmark(particles, frames, warmup=60, wind=True, texts=(), seed=0, offscreen=False,
+                  trace_memory=False, workers=0):
+    particules.open_screen(offscreen=offscreen)
+    capacity = max(particles * 2, 1)
+    pool = None
+    if workers:
+        pool = particle_workers.ParallelParticleSystem(capacity, seed=seed, workers=workers)
+    simulation = particules.Simulation(seed=seed, max_particles=capacity, initial_particles=particles,
+                                       particles=pool)
+    simulation.wind_effect = wind
+    total = warmup + frames
+    text_frames = {(i + 1) * total // (len(texts) + 1): text for i, text in enumerate(texts)}
+
+    timings = {phase: [] for phase in PHASES}
+    frame_times = []
+    if trace_memory:
+        tracemalloc.start()
+    for frame in range(total):
+        t0 = time.perf_counter()
+        simulation.handle_events()
+        if frame in text_frames:
+            # Same work handle_events does when Enter is pressed in the input box
+            simulation.input_text = text_frames[frame]
+            simulation.create_text_particles()
+            simulation.input_text = ""
+        t1 = time.perf_counter()
+        simulation.update(scripted_mouse(frame))
+        t2 = time.perf_counter()
+        simulation.draw()
+        t3 = time.perf_counter()
+        if not offscreen:
+            pygame.display.flip()
+        t4 = time.perf_counter()
+
+        if frame >= warmup:
+            for phase, elapsed in zip(PHASES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                timings[phase].append(elapsed)
+            frame_times.append(t4 - t0)
+
+    final_particles = len(simulation.particles)
+    if pool is not None:
+        pool.close()
+
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    frame_ms = np.asarray(frame_times) * 1000
+    fps = 1000 / np.maximum(frame_ms, 1e-6)
+    return {
+        "config": {
+            "particles": particles,
+            "frames": frames,
+            "warmup": warmup,
+            "wind": wind,
+            "texts": list(texts),
+            "seed": seed,
+            "workers": workers,
+            "offscreen": offscreen,
+            "video_driver": None if offscreen else pygame.display.get_driver(),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "final_particles": final_particles,
+        "phases": {phase: summarize(samples) for phase, samples in timings.items()},
+        "frame": summarize(frame_times),
+        "fps": {
+            "mean": round(float(len(frame_ms) * 1000 / frame_ms.sum()), 2),
+            "p50": round(float(np.percentile(fps, 50)), 2),
+            "p5": round(float(np.percentile(fps, 5)), 2),
+            "p1": round(float(np.percentile(fps, 1)), 2),
+        },
+        "memory": {
+            "peak_rss_kb": peak_rss_kb(),
+            "peak_traced_bytes": traced_peak,
+        },
+    }
+
+
+def check_orbit(phase=140000.0, steps=1000, particle_speed=0.1, particles=256, seed=0, tolerance=1.0):
+    """Step orbiting particles from a large phase and compare with float64 maths."""
+    system = particules.ParticleSystem(particles, seed=seed)
+    system.spawn_random(particles, 0)
+    n = system.end
+    system.t[:n] += np.float32(phase)
+    # The first step still adds to the large phase; follow the orbit from there
+    system.update(None, False, 1.0, particle_speed)
+    t = system.t[:n].astype(np.float64)
+    x, y = system.x[:n].astype(np.float64), system.y[:n].astype(np.float64)
+    step = 0.05 * particle_speed
+    min_move = math.inf
+    for _ in range(steps):
+        before = system.x[:n].copy(), system.y[:n].copy()
+        system.update(None, False, 1.0, particle_speed)
+        min_move = min(min_move, float(np.hypot(system.x[:n] - before[0], system.y[:n] - before[1]).max()))
+        t += step
+        x += (particules.WIDTH // 2 + 200 * np.sin(t) - x) * step
+        y += (particules.HEIGHT // 3 + 100 * np.sin(t * 2) - y) * step
+    error = float(np.hypot(system.x[:n] - x, system.y[:n] - y).max())
+    return {
+        "phase": phase,
+        "steps": steps,
+        "particle_speed": particle_speed,
+        "max_error_px": round(error, 4),
+        "min_frame_move_px": round(min_move, 4),
+        "ok": error <= tolerance and min_move > 0,
+    }
+
+
+def masked_brute_force_wind(system, start, stop, mouse_pos, wind_strength, particle_speed):
+    # Reference for compare_wind: hypot over every particle, then a mask
+    x, y = system.x[start:stop], system.y[start:stop]
+    force = system.wind_force[start:stop]
+    wind_cos, wind_sin = system.wind_cos[start:stop], system.wind_sin[start:stop]
+    force *= 0.98
+    dx = mouse_pos[0] - x
+    dy = mouse_pos[1] - y
+    d = np.hypot(dx, dy)
+    near = np.flatnonzero(d < 150)
+    d, dx, dy = d[near], dx[near], dy[near]
+    if near.size:
+        force[near] = (150 - d) / 10 * wind_strength
+        safe = np.where(d > 0, d, 1)
+        wind_cos[near] = np.where(d > 0, dx / safe, 1)
+        wind_sin[near] = dy / safe
+    push = force * particle_speed
+    x += wind_cos * push
+    y += wind_sin * push
+
+
+def compare_wind(particles=100000, frames=200, warmup=200, seed=0):
+    """Mean wind-step time of ParticleSystem and of the brute-force reference, per cursor path."""
+    cursors = {
+        "away_from_orbit": lambda frame: (particules.WIDTH - 100, particules.HEIGHT - 100),
+        "sweeping_orbit": scripted_mouse,
+    }
+    winds = {"current": particules.ParticleSystem._apply_wind, "masked_brute_force": masked_brute_force_wind}
+    report = {"particles": particles, "frames": frames}
+    for name, cursor in cursors.items():
+        systems = {}
+        for label in winds:
+            system = systems[label] = particules.ParticleSystem(particles * 2, seed=seed)
+            system.spawn_random(particles, 0)
+            for frame in range(warmup):
+                system.update(cursor(frame), True, 1.0, 1.0)
+        # Both versions step the same state, interleaved frame by frame so
+        # that machine noise hits them alike; only the wind step is timed
+        elapsed = dict.fromkeys(winds, 0.0)
+        for frame in range(frames):
+            for label, wind in winds.items():
+                system = systems[label]
+                start = time.perf_counter()
+                wind(system, 0, system.end, cursor(frame), 1.0, 1.0)
+                elapsed[label] += time.perf_counter() - start
+        report[name] = {label + "_ms": round(total / frames * 1000, 4) for label, total in elapsed.items()}
+        current, reference = systems["current"], systems["masked_brute_force"]
+        n = current.end
+        report[name]["max_difference_px"] = float(max(np.abs(current.x[:n] - reference.x[:n]).max(),
+                                                       np.abs(current.y[:n] - reference.y[:n]).max()))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--particles", type=int, default=10000, help="initial particle count")
+    parser.add_argument("--frames", type=int, default=600, help="measured frames")
+    parser.add_argument("--warmup", type=int, default=60, help="frames run before measuring")
+    parser.add_argument("--no-wind", dest="wind", action="store_false", help="disable the mouse wind")
+    parser.add_argument("--text", dest="texts", action="append", default=[],
+                        help="text payload to form during the run (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--offscreen", action="store_true",
+                        help="draw into a plain Surface instead of a dummy-driver window (no flip)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report the tracemalloc peak (slows the run down)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="advance particles in this many worker processes (0: serial)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--check-orbit", action="store_true",
+                        help="check the orbit after a very long uptime instead of benchmarking")
+    parser.add_argument("--compare-wind", action="store_true",
+                        help="time the wind step against the masked brute-force version instead")
+    args = parser.parse_args(argv)
+
+    if args.compare_wind:
+        print(json.dumps(compare_wind(max(args.particles, 1), args.frames, seed=args.seed), indent=2))
+        return
+    if args.check_orbit:
+        report = check_orbit(seed=args.seed)
+        print(json.dumps(report, indent=2))
+        if not report["ok"]:
+            sys.exit(1)
+        return
+
+    report = run_benchmark(args.particles, args.frames, warmup=args.warmup, wind=args.wind,
+                           texts=args.texts, seed=args.seed, offscreen=args.offscreen,
+                           trace_memory=args.trace_memory, workers=args.workers)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
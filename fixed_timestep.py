@@ -0,0 +1,55 @@
+"""Fixed-timestep accumulator shared by the game loops.
+
+Wall-clock time is turned into a whole number of fixed logic steps, so
+anything counted in steps (speeds, cooldowns, lifetimes) runs at the same
+pace whatever the frame rate. The unspent remainder is exposed as ``alpha``
+for drawing positions between the last two steps::
+
+    timestep = FixedTimestep(rate=60)
+    while running:
+        for _ in range(timestep.advance()):
+            update()
+        draw(timestep.alpha)
+"""
+import time
+
+
+class FixedTimestep:
+    """Accumulates frame time and hands it back as fixed ``1 / rate`` steps.
+
+    At most ``max_steps`` are run per frame; time beyond that is dropped, so a
+    long stall slows the simulation down instead of freezing it while it
+    catches up.
+    """
+
+    def __init__(self, rate=60, max_steps=5, clock=time.perf_counter):
+        self.rate = rate
+        self.dt = 1 / rate
+        self.max_steps = max_steps
+        self.clock = clock
+        self.accumulator = 0.0
+        self.previous = None
+        self.dropped = 0
+
+    def advance(self):
+        """Return how many logic steps to run for the time elapsed since the last call."""
+        now = self.clock()
+        if self.previous is None:
+            # First frame: one step, so there is something to draw
+            self.previous = now
+            self.accumulator = self.dt
+        self.accumulator += now - self.previous
+        self.previous = now
+        # The epsilon keeps two half steps of rounding error from adding up to none
+        steps = int((self.accumulator + 1e-9) // self.dt)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = self.accumulator % self.dt + steps * self.dt
+        self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        """Fraction of a step elapsed since the last one, in [0, 1)."""
+        return min(max(self.accumulator / self.dt, 0.0), 1.0)
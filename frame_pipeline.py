@@ -0,0 +1,78 @@
+"""Two-stage frame pipeline shared by the game loops.
+
+The simulation for frame N+1 runs on a worker thread while the main thread
+draws and flips frame N from a snapshot. NumPy kernels and pygame's blits and
+flips release the GIL, so the two stages overlap on a multi-core machine::
+
+    pipeline = FramePipeline(advance)      # advance(job) -> snapshot, on the worker
+    pipeline.submit(first_job)
+    while running:
+        snapshot = pipeline.collect()      # waits for the batch in flight
+        handle_events()                    # worker idle: safe to touch the state
+        pipeline.submit(next_job)
+        draw(snapshot)
+
+At most one batch is in flight, so what is on screen is never more than one
+frame behind the simulation. The worker owns the simulation state between
+``submit`` and ``collect``. The main thread may only touch it while no batch
+is in flight. ``advance`` must return a snapshot that later batches do not
+modify. Keeping two snapshot buffers and alternating between them is enough.
+"""
+import queue
+import threading
+
+_STOP = object()
+
+
+class FramePipeline:
+    """Runs ``advance(job)`` on a worker thread, one batch at a time."""
+
+    def __init__(self, advance, name="simulation"):
+        self.advance = advance
+        self.in_flight = False
+        self._jobs = queue.Queue(maxsize=1)
+        self._results = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._work, name=name, daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            try:
+                self._results.put((self.advance(job), None))
+            except BaseException as exc:
+                self._results.put((None, exc))
+
+    def submit(self, job):
+        if self.in_flight:
+            raise RuntimeError("collect() the batch in flight before submitting another")
+        self.in_flight = True
+        self._jobs.put(job)
+
+    def collect(self):
+        """Wait for the batch in flight and return its snapshot; worker errors are raised here."""
+        if not self.in_flight:
+            raise RuntimeError("no batch in flight")
+        snapshot, error = self._results.get()
+        self.in_flight = False
+        if error is not None:
+            raise error
+        return snapshot
+
+    def close(self):
+        """Let the batch in flight finish, then stop the worker."""
+        try:
+            if self.in_flight:
+                self._results.get()
+                self.in_flight = False
+        finally:
+            self._jobs.put(_STOP)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,195 @@
+"""Per-frame timing scopes, counters and overlay shared by the game loops.
+
+Wrap the parts of a frame in named scopes, set counters, and close the frame
+once it is on screen::
+
+    profiler = FrameProfiler(export="frames.jsonl")
+    while running:
+        with profiler.scope("update"):
+            update()
+        profiler.count("particles", len(particles))
+        profiler.draw(screen)   # only while the overlay is shown
+        pygame.display.flip()
+        profiler.end_frame()
+
+Scope times add up over a frame, so a scope entered once per logic step
+reports the total of that frame's steps. Each closed frame becomes one row
+of the export: JSON lines, or CSV when the path ends in ``.csv``. A CSV gets
+its columns from the first frame.
+
+A profiler with no export starts disabled. ``scope`` then hands back a shared
+no-op context manager and ``count`` and ``end_frame`` return straight away,
+so hooks left in a loop cost next to nothing. Showing the overlay with
+:meth:`toggle_overlay` switches collection on.
+
+A profiler is not thread-safe. Scopes timed on a worker thread go to a
+:meth:`fork` of it, and :meth:`merge` folds them into the frame while the
+worker is idle.
+"""
+import collections
+import contextlib
+import csv
+import json
+import sys
+import time
+
+import pygame
+
+_NULL_SCOPE = contextlib.nullcontext()
+
+# 60 fps budget line drawn across the frame-time graph
+TARGET_FRAME_MS = 1000 / 60
+
+
+class _Scope:
+    __slots__ = ("totals", "name", "start")
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.totals[self.name] += time.perf_counter() - self.start
+
+
+class FrameProfiler:
+    """Collects scope times and counters per frame; see the module docstring."""
+
+    def __init__(self, export=None, history=240, clock=time.perf_counter):
+        self.clock = clock
+        self.overlay = False
+        self.frames = 0
+        self.scopes = collections.defaultdict(float)
+        self.counters = {}
+        # Last closed frames, for the overlay: frame times and scope averages
+        self.frame_times = collections.deque(maxlen=history)
+        self.recent_scopes = collections.deque(maxlen=history)
+        self.last_counters = {}
+        self._frame_start = None
+        self._blocks = None
+        self._font = None
+        self._file = None
+        self._writer = None
+        if export:
+            self._file = open(export, "w", newline="")
+            self._csv = export.endswith(".csv")
+        self.enabled = self._file is not None
+
+    def scope(self, name):
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self.scopes, name)
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counters[name] = value
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.enabled = self.overlay or self._file is not None
+        # Time spent disabled is not a frame
+        self._frame_start = None
+        self.scopes.clear()
+        self.counters.clear()
+
+    def fork(self):
+        """Profiler for the scopes of another thread, folded back in with merge()."""
+        child = FrameProfiler(clock=self.clock)
+        child.enabled = self.enabled
+        return child
+
+    def merge(self, child):
+        """Add a fork's scope times to this frame; only call while its thread is idle."""
+        if self.enabled:
+            for name, total in child.scopes.items():
+                self.scopes[name] += total
+        child.scopes.clear()
+        child.enabled = self.enabled
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = self.clock()
+        blocks = sys.getallocatedblocks()
+        if self._frame_start is not None:
+            frame_ms = (now - self._frame_start) * 1000
+            scopes_ms = {name: total * 1000 for name, total in self.scopes.items()}
+            # Net change in live interpreter memory blocks over the frame
+            self.counters["alloc_blocks"] = blocks - self._blocks
+            self.frames += 1
+            self.frame_times.append(frame_ms)
+            self.recent_scopes.append(scopes_ms)
+            self.last_counters = dict(self.counters)
+            if self._file is not None:
+                self._export(frame_ms, scopes_ms)
+        self._frame_start = now
+        self._blocks = blocks
+        self.scopes.clear()
+        self.counters.clear()
+
+    def _export(self, frame_ms, scopes_ms):
+        row = {"frame": self.frames, "frame_ms": round(frame_ms, 3)}
+        row.update((name + "_ms", round(value, 3)) for name, value in scopes_ms.items())
+        row.update(self.counters)
+        if not self._csv:
+            self._file.write(json.dumps(row) + "\n")
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(row), extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerow(row)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.enabled = self.overlay
+
+    def draw(self, surface, pos=(10, 10), width=260, graph_height=60):
+        """Draw the overlay when it is shown; returns the rect drawn over, or None."""
+        if not self.overlay:
+            return None
+        if self._font is None:
+            pygame.font.init()
+            self._font = pygame.font.Font(None, 18)
+
+        frames = len(self.frame_times)
+        lines = []
+        if frames:
+            mean = sum(self.frame_times) / frames
+            lines.append((f"frame  ({1000 / mean:.0f} fps, max {max(self.frame_times):.1f} ms)",
+                          f"{mean:.2f} ms"))
+            totals = collections.defaultdict(float)
+            for scopes in self.recent_scopes:
+                for name, value in scopes.items():
+                    totals[name] += value
+            lines += [(name, f"{total / frames:.2f} ms") for name, total in totals.items()]
+            lines += [(name, str(value)) for name, value in self.last_counters.items()]
+
+        line_height = self._font.get_linesize()
+        panel = pygame.Rect(pos, (width, graph_height + 8 + line_height * len(lines) + 4))
+        backdrop = pygame.Surface(panel.size, pygame.SRCALPHA)
+        backdrop.fill((0, 0, 0, 176))
+        surface.blit(backdrop, panel)
+
+        # Frame-time graph, scaled so the 60 fps budget sits at mid-height
+        graph = pygame.Rect(panel.x + 4, panel.y + 4, width - 8, graph_height)
+        scale = graph_height / (2 * TARGET_FRAME_MS)
+        budget_y = graph.bottom - TARGET_FRAME_MS * scale
+        pygame.draw.line(surface, (90, 90, 90), (graph.left, budget_y), (graph.right, budget_y))
+        if frames > 1:
+            step = graph.width / (self.frame_times.maxlen - 1)
+            points = [(graph.left + i * step, max(graph.top, graph.bottom - ms * scale))
+                      for i, ms in enumerate(self.frame_times)]
+            pygame.draw.lines(surface, (120, 220, 120), False, points)
+
+        y = graph.bottom + 4
+        for label, value in lines:
+            surface.blit(self._font.render(label, True, (230, 230, 230)), (panel.x + 4, y))
+            text = self._font.render(value, True, (230, 230, 230))
+            surface.blit(text, text.get_rect(topright=(panel.right - 4, y)))
+            y += line_height
+        return panel
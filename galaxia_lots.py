@@ -0,0 +1,529 @@
+"""Lots de parties de Galaxia avancées ensemble avec NumPy.
+
+LotGalaxia garde N parties dans des tableaux de taille fixe (une ligne par
+partie, une colonne par emplacement d'ennemi, de laser ou d'astéroïde) et les
+fait toutes avancer d'un pas à la fois. Les règles sont celles d'EtatJeu pour
+le vaisseau, les ennemis, les lasers normaux et les astéroïdes : mêmes
+déplacements, mêmes rectangles (lasers balayés compris), mêmes dégâts, combos,
+expérience, bouclier et explosion. Le boss, les power-ups, les zones de danger
+et les missions ne sont pas simulés, et le hasard vient d'un générateur NumPy :
+une graine ne redonne donc pas la même partie qu'EtatJeu. Une partie terminée
+est aussitôt remise à zéro.
+
+Les astéroïdes ne sont pas bornés dans EtatJeu : chacun revient en haut de
+l'écran tant qu'il n'est pas ramassé. Ici, une apparition qui ne trouve pas
+d'emplacement libre parmi les MAX_ASTEROIDES est perdue sans bruit. Vers 1 %
+de chance par pas, cela arrive au bout d'une minute environ d'une partie où le
+vaisseau ramasse peu, et les longues parties divergent alors d'EtatJeu.
+
+    lot = LotGalaxia(4096, graine=0)
+    observations, recompenses, terminees = lot.pas(actions)  # masques ACTION_*
+
+LotGalaxiaParallele répartit les parties entre plusieurs processus.
+
+    python galaxia_lots.py --verifier 3000   # un pas comparé à EtatJeu sur des états tirés au hasard
+    python galaxia_lots.py --debit 4096      # pas de parties par seconde
+"""
+import argparse
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from ClaudeGalaxia import (LARGEUR, HAUTEUR, FREQUENCE_LOGIQUE, ACTION_GAUCHE, ACTION_DROITE,
+                           ACTION_HAUT, ACTION_BAS, ACTION_TIR, ACTION_BOUCLIER, ACTION_EXPLOSION)
+
+MAX_ENNEMIS = 16
+MAX_LASERS = 64
+# Au-delà, les nouveaux astéroïdes sont perdus (voir plus haut)
+MAX_ASTEROIDES = 32
+
+LARGEUR_VAISSEAU, HAUTEUR_VAISSEAU = 40, 50
+LARGEUR_LASER, HAUTEUR_LASER = 4, 20
+VITESSE_LASER = -10
+TAILLE_ASTEROIDE = 30
+# Côté de l'image d'un ennemi selon son niveau (1, 2, 3 et plus)
+TAILLES_ENNEMIS = np.array([30, 30, 40, 50], dtype=np.int32)
+
+
+def arrondir(valeurs):
+    # Comme l'affectation d'un float à un pygame.Rect : au plus proche, 0.5 loin de zéro
+    return np.trunc(valeurs + np.copysign(0.5, valeurs)).astype(np.int32)
+
+
+def chevauche(ax, ay, aw, ah, bx, by, bw, bh):
+    # Rect.colliderect sur des tableaux int32 diffusés les uns contre les autres.
+    # bx - aw < ax < bx + bw s'écrit 0 <= ax - bx + aw - 1 < aw + bw - 1 : un
+    # seul test en non signé par axe (les tailles sont des entiers positifs)
+    dx = (ax - bx + np.int32(aw - 1)).view(np.uint32)
+    dy = (ay - by + np.int32(ah - 1)).view(np.uint32)
+    return (dx < aw + bw - 1) & (dy < ah + bh - 1)
+
+
+class LotGalaxia:
+    def __init__(self, n, graine=None, pimpage=None, niveau=1):
+        pimpage = pimpage or {}
+        self.n = n
+        self.niveau = niveau
+        self.rng = np.random.default_rng(graine)
+        self.pimpage_vitesse = pimpage.get('vitesse', 0)
+        self.pimpage_bouclier = pimpage.get('bouclier', 0)
+        self.puissance_laser = 10 + pimpage.get('puissance_tir', 0)
+        self.taille_ennemi = int(TAILLES_ENNEMIS[min(niveau, 3)])
+
+        # Vaisseau
+        self.x = np.zeros(n, dtype=np.int32)
+        self.y = np.zeros(n, dtype=np.int32)
+        self.vitesse = np.zeros(n, dtype=np.float64)
+        self.bouclier = np.zeros(n, dtype=np.float64)
+        self.xp = np.zeros(n, dtype=np.int32)
+        self.niveau_joueur = np.zeros(n, dtype=np.int32)
+        self.capacite_bouclier = np.zeros(n, dtype=np.int32)
+        self.capacite_explosion = np.zeros(n, dtype=np.int32)
+        self.combo = np.zeros(n, dtype=np.int32)
+        self.tick_dernier_kill = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.float64)
+        self.ressources = np.zeros(n, dtype=np.int64)
+        self.tick = np.zeros(n, dtype=np.int64)
+
+        # Ennemis
+        self.ex = np.zeros((n, MAX_ENNEMIS), dtype=np.int32)
+        self.ey = np.zeros((n, MAX_ENNEMIS), dtype=np.int32)
+        self.ev = np.zeros((n, MAX_ENNEMIS), dtype=np.int32)
+        self.ed = np.zeros((n, MAX_ENNEMIS), dtype=np.int32)
+        self.evie = np.zeros((n, MAX_ENNEMIS), dtype=np.int32)
+        self.ennemi_vivant = np.zeros((n, MAX_ENNEMIS), dtype=bool)
+
+        # Lasers, rangés en anneau : prochain_laser est le plus ancien emplacement,
+        # donc l'ordre de tir, celui du groupe lasers, se lit à partir de lui
+        self.lx = np.zeros((n, MAX_LASERS), dtype=np.int32)
+        self.ly = np.zeros((n, MAX_LASERS), dtype=np.int32)
+        self.laser_vivant = np.zeros((n, MAX_LASERS), dtype=bool)
+        self.prochain_laser = np.zeros(n, dtype=np.int64)
+
+        # Astéroïdes
+        self.ax = np.zeros((n, MAX_ASTEROIDES), dtype=np.int32)
+        self.ay = np.zeros((n, MAX_ASTEROIDES), dtype=np.int32)
+        self.av = np.zeros((n, MAX_ASTEROIDES), dtype=np.int32)
+        self.ares = np.zeros((n, MAX_ASTEROIDES), dtype=np.int32)
+        self.asteroide_vivant = np.zeros((n, MAX_ASTEROIDES), dtype=bool)
+
+        self.scores_finaux = np.zeros(n, dtype=np.float64)
+        self.parties_terminees = 0
+        self.reinitialiser(np.ones(n, dtype=bool))
+
+    def reinitialiser(self, parties):
+        self.x[parties] = LARGEUR // 2 - LARGEUR_VAISSEAU // 2
+        self.y[parties] = HAUTEUR - 10 - HAUTEUR_VAISSEAU
+        self.vitesse[parties] = 5
+        self.bouclier[parties] = 100
+        self.xp[parties] = 0
+        self.niveau_joueur[parties] = 1
+        self.capacite_bouclier[parties] = 0
+        self.capacite_explosion[parties] = 0
+        self.combo[parties] = 0
+        self.tick_dernier_kill[parties] = 0
+        self.score[parties] = 0
+        self.ressources[parties] = 0
+        self.tick[parties] = 0
+        self.ennemi_vivant[parties] = False
+        self.laser_vivant[parties] = False
+        self.prochain_laser[parties] = 0
+        self.asteroide_vivant[parties] = False
+
+    def _premier_libre(self, vivants, demandes):
+        # Parties qui demandent un emplacement et en ont un, avec l'indice du premier libre
+        libres = ~vivants
+        parties = np.flatnonzero(demandes & libres.any(axis=1))
+        return parties, libres[parties].argmax(axis=1)
+
+    def pas(self, actions):
+        actions = np.asarray(actions)
+        n = self.n
+        rng = self.rng
+        lignes = np.arange(n)
+
+        # Actions ponctuelles
+        tir = (actions & ACTION_TIR) != 0
+        parties = np.flatnonzero(tir & ~self.laser_vivant[lignes, self.prochain_laser])
+        emplacements = self.prochain_laser[parties]
+        self.lx[parties, emplacements] = self.x[parties] + LARGEUR_VAISSEAU // 2 - LARGEUR_LASER // 2
+        self.ly[parties, emplacements] = self.y[parties] - HAUTEUR_LASER
+        self.laser_vivant[parties, emplacements] = True
+        self.prochain_laser[parties] = (emplacements + 1) % MAX_LASERS
+
+        bouclier = ((actions & ACTION_BOUCLIER) != 0) & (self.capacite_bouclier == 0)
+        self.bouclier[bouclier] = 100 + self.pimpage_bouclier
+        self.capacite_bouclier[bouclier] = 600
+
+        explosion = ((actions & ACTION_EXPLOSION) != 0) & (self.capacite_explosion == 0)
+        self.capacite_explosion[explosion] = 1800
+        self.evie[explosion[:, None] & self.ennemi_vivant] = 0
+
+        # Mise à jour du vaisseau
+        deplacement = self.vitesse + self.pimpage_vitesse
+        gauche = ((actions & ACTION_GAUCHE) != 0) & (self.x > 0)
+        self.x = np.where(gauche, arrondir(self.x - deplacement), self.x)
+        droite = ((actions & ACTION_DROITE) != 0) & (self.x + LARGEUR_VAISSEAU < LARGEUR)
+        self.x = np.where(droite, arrondir(self.x + deplacement), self.x)
+        haut = ((actions & ACTION_HAUT) != 0) & (self.y > 0)
+        self.y = np.where(haut, arrondir(self.y - deplacement), self.y)
+        bas = ((actions & ACTION_BAS) != 0) & (self.y + HAUTEUR_VAISSEAU < HAUTEUR)
+        self.y = np.where(bas, arrondir(self.y + deplacement), self.y)
+        self.capacite_bouclier -= self.capacite_bouclier > 0
+        self.capacite_explosion -= self.capacite_explosion > 0
+
+        # Mise à jour des lasers
+        self.ly += VITESSE_LASER * self.laser_vivant
+        self.laser_vivant &= self.ly + HAUTEUR_LASER >= 0
+
+        # Mise à jour des ennemis : descente, rebond sur les bords, retour en haut
+        taille = self.taille_ennemi
+        vivants = self.ennemi_vivant
+        self.ey += self.ev * vivants
+        self.ex += self.ed * 2 * vivants
+        rebond = vivants & ((self.ex < 0) | (self.ex + taille > LARGEUR))
+        self.ed[rebond] *= -1
+        sortis = np.nonzero(vivants & (self.ey > HAUTEUR))
+        self.ex[sortis] = rng.integers(0, LARGEUR - taille, len(sortis[0]), endpoint=True)
+        self.ey[sortis] = rng.integers(-100, -40, len(sortis[0]), endpoint=True)
+        self.ev[sortis] = rng.integers(1, 3 + self.niveau, len(sortis[0]), endpoint=True)
+
+        # Mise à jour des astéroïdes
+        vivants = self.asteroide_vivant
+        self.ay += self.av * vivants
+        sortis = np.nonzero(vivants & (self.ay > HAUTEUR))
+        self.ax[sortis] = rng.integers(0, LARGEUR - TAILLE_ASTEROIDE, len(sortis[0]), endpoint=True)
+        self.ay[sortis] = rng.integers(-100, -40, len(sortis[0]), endpoint=True)
+        self.av[sortis] = rng.integers(1, 3, len(sortis[0]), endpoint=True)
+
+        # Génération d'ennemis
+        tirage = rng.random(n)
+        demandes = (self.ennemi_vivant.sum(axis=1) < 5 + self.niveau) & (tirage < 0.02)
+        parties, emplacements = self._premier_libre(self.ennemi_vivant, demandes)
+        k = len(parties)
+        self.ex[parties, emplacements] = rng.integers(0, LARGEUR - taille, k, endpoint=True)
+        self.ey[parties, emplacements] = rng.integers(-100, -40, k, endpoint=True)
+        self.ev[parties, emplacements] = rng.integers(1, 3 + self.niveau, k, endpoint=True)
+        self.ed[parties, emplacements] = rng.choice(np.array([-1, 1], dtype=np.int32), k)
+        self.evie[parties, emplacements] = 10 * self.niveau
+        self.ennemi_vivant[parties, emplacements] = True
+
+        # Génération d'astéroïdes
+        parties, emplacements = self._premier_libre(self.asteroide_vivant, rng.random(n) < 0.01)
+        k = len(parties)
+        self.ax[parties, emplacements] = rng.integers(0, LARGEUR - TAILLE_ASTEROIDE, k, endpoint=True)
+        self.ay[parties, emplacements] = rng.integers(-100, -40, k, endpoint=True)
+        self.av[parties, emplacements] = rng.integers(1, 3, k, endpoint=True)
+        self.ares[parties, emplacements] = rng.integers(10, 50, k, endpoint=True)
+        self.asteroide_vivant[parties, emplacements] = True
+
+        score_avant = self.score.copy()
+        self._collisions()
+
+        self.tick += 1
+        recompenses = self.score - score_avant
+        terminees = self.bouclier <= 0
+        if terminees.any():
+            self.scores_finaux[terminees] = self.score[terminees]
+            self.parties_terminees += int(terminees.sum())
+            self.reinitialiser(terminees)
+        return self.observation(), recompenses, terminees
+
+    def _collisions(self):
+        taille = self.taille_ennemi
+
+        # Collisions laser-ennemi. Les lasers sont parcourus dans l'ordre de tir :
+        # un laser blesse chaque ennemi qu'il touche et qui est encore en vie,
+        # c'est-à-dire qui n'a pas encore été touché ou dont la vie de départ
+        # dépasse les dégâts des lasers précédents. Le rectangle du laser est
+        # balayé, comme Laser.rect_collision. Le test se fait ennemi vivant par
+        # ennemi vivant, contre les seuls lasers récents de sa partie, et
+        # seulement dans les parties qui ont à la fois un laser et un ennemi.
+        tues = np.zeros_like(self.ennemi_vivant)
+        parties = np.flatnonzero(self.laser_vivant.any(axis=1) & self.ennemi_vivant.any(axis=1))
+        if len(parties):
+            # Les lasers meurent à peu près dans l'ordre de tir : les vivants
+            # tiennent dans la fin de l'anneau, à partir du plus ancien d'entre
+            # eux. ordre donne les emplacements dans l'ordre de tir, en indices à
+            # plat dans les tableaux (n, MAX_LASERS), plus rapides à lire
+            ordre = self.prochain_laser[parties, None] + np.arange(MAX_LASERS)
+            ordre -= MAX_LASERS * (ordre >= MAX_LASERS)
+            ordre += parties[:, None] * MAX_LASERS
+            vivants = self.laser_vivant.ravel().take(ordre)
+            debut = int(vivants.argmax(axis=1).min())
+            ordre, vivants = ordre[:, debut:], vivants[:, debut:]
+
+            # Une ligne par ennemi vivant : rang de sa partie dans parties, emplacement
+            rangs, cibles = np.nonzero(self.ennemi_vivant[parties])
+            lignes = parties[rangs]
+            lasers = ordre[rangs]
+            touches = chevauche(self.lx.ravel().take(lasers), self.ly.ravel().take(lasers),
+                                LARGEUR_LASER, HAUTEUR_LASER - VITESSE_LASER,
+                                self.ex[lignes, cibles][:, None], self.ey[lignes, cibles][:, None],
+                                taille, taille)
+            touches &= vivants[rangs]
+
+            # Le cumul des dégâts ne se fait que sur les ennemis touchés
+            touchees = np.flatnonzero(touches.any(axis=1))
+            lignes, cibles, lasers, touches = lignes[touchees], cibles[touchees], lasers[touchees], touches[touchees]
+            degats = touches * np.int32(self.puissance_laser)
+            avant = np.cumsum(degats, axis=1) - degats
+            vie = self.evie[lignes, cibles]
+            appliques = touches & ((avant == 0) | (vie[:, None] - avant > 0))
+            total = (degats * appliques).sum(axis=1)
+            tues[lignes, cibles] = appliques.any(axis=1) & (vie - total <= 0)
+            self.evie[lignes, cibles] = vie - total
+            self.ennemi_vivant &= ~tues
+            i, k = np.nonzero(appliques)
+            self.laser_vivant.flat[lasers[i, k]] = False
+
+        # Score, expérience et combo, ennemi par ennemi
+        base = 10 * self.niveau
+        kills = tues.sum(axis=1)
+        for i in range(int(kills.max(initial=0))):
+            parties = kills > i
+            self.score[parties] += base * (1 + self.combo[parties] * 0.1)
+            self.xp[parties] += 5 * self.niveau
+            monte = parties & (self.xp >= self.niveau_joueur * 100)
+            self.niveau_joueur[monte] += 1
+            self.vitesse[monte] += 0.5
+            self.bouclier[monte] += 20
+            rapproche = self.tick[parties] - self.tick_dernier_kill[parties] < FREQUENCE_LOGIQUE
+            self.combo[parties] = np.where(rapproche, self.combo[parties] + 1, 0)
+            self.tick_dernier_kill[parties] = self.tick[parties]
+
+        # Collisions vaisseau-ennemi
+        x, y = self.x[:, None], self.y[:, None]
+        contacts = self.ennemi_vivant & chevauche(x, y, LARGEUR_VAISSEAU, HAUTEUR_VAISSEAU,
+                                                  self.ex, self.ey, taille, taille)
+        self.ennemi_vivant &= ~contacts
+        self.bouclier -= 20 * contacts.sum(axis=1)
+
+        # Collisions vaisseau-astéroïde
+        contacts = self.asteroide_vivant & chevauche(x, y, LARGEUR_VAISSEAU, HAUTEUR_VAISSEAU,
+                                                     self.ax, self.ay, TAILLE_ASTEROIDE, TAILLE_ASTEROIDE)
+        self.asteroide_vivant &= ~contacts
+        self.ressources += (self.ares * contacts).sum(axis=1)
+
+    def observation(self):
+        # Par partie : vaisseau (x, y, bouclier), puis (x, y, vivant) pour chaque
+        # ennemi et chaque astéroïde, positions ramenées à l'écran
+        obs = np.empty((self.n, 3 + 3 * (MAX_ENNEMIS + MAX_ASTEROIDES)), dtype=np.float32)
+        obs[:, 0] = self.x
+        obs[:, 1] = self.y
+        obs[:, 2] = self.bouclier
+        obs[:, :3] /= (LARGEUR, HAUTEUR, 100)
+        fin = 3 + 3 * MAX_ENNEMIS
+        ennemis = obs[:, 3:fin].reshape(self.n, MAX_ENNEMIS, 3)
+        ennemis[:, :, 0] = self.ex
+        ennemis[:, :, 1] = self.ey
+        ennemis[:, :, 2] = self.ennemi_vivant
+        asteroides = obs[:, fin:].reshape(self.n, MAX_ASTEROIDES, 3)
+        asteroides[:, :, 0] = self.ax
+        asteroides[:, :, 1] = self.ay
+        asteroides[:, :, 2] = self.asteroide_vivant
+        obs[:, 3:] /= np.tile(np.array([LARGEUR, HAUTEUR, 1], dtype=np.float32), MAX_ENNEMIS + MAX_ASTEROIDES)
+        return obs
+
+def _processus_lot(connexion, n, graine, pimpage, niveau):
+    lot = LotGalaxia(n, graine, pimpage, niveau)
+    connexion.send(lot.observation())
+    while True:
+        actions = connexion.recv()
+        if actions is None:
+            break
+        connexion.send(lot.pas(actions))
+    connexion.close()
+
+
+class LotGalaxiaParallele:
+    # Même interface que LotGalaxia, les parties étant réparties entre
+    # plusieurs processus qui avancent leur part en même temps
+    def __init__(self, n, processus=None, graine=None, pimpage=None, niveau=1, methode=None):
+        processus = processus or multiprocessing.cpu_count()
+        contexte = multiprocessing.get_context(methode)
+        graines = np.random.SeedSequence(graine).spawn(processus)
+        self.tailles = [n * (i + 1) // processus - n * i // processus for i in range(processus)]
+        self.connexions = []
+        self.processus = []
+        for taille, sous_graine in zip(self.tailles, graines):
+            parent, enfant = contexte.Pipe()
+            p = contexte.Process(target=_processus_lot, daemon=True,
+                                 args=(enfant, taille, sous_graine, pimpage, niveau))
+            p.start()
+            enfant.close()
+            self.connexions.append(parent)
+            self.processus.append(p)
+        self.observations = np.concatenate([c.recv() for c in self.connexions])
+
+    def pas(self, actions):
+        actions = np.asarray(actions)
+        debut = 0
+        for connexion, taille in zip(self.connexions, self.tailles):
+            connexion.send(actions[debut:debut + taille])
+            debut += taille
+        resultats = [connexion.recv() for connexion in self.connexions]
+        self.observations, recompenses, terminees = (np.concatenate(parts) for parts in zip(*resultats))
+        return self.observations, recompenses, terminees
+
+    def fermer(self):
+        for connexion in self.connexions:
+            connexion.send(None)
+            connexion.close()
+        for p in self.processus:
+            p.join()
+        self.connexions = []
+        self.processus = []
+
+
+# Pour verifier : aucun tirage ne passe sous un seuil d'apparition, ni dans
+# EtatJeu ni dans LotGalaxia, si bien que seules les règles sont comparées
+class _EtatSansApparition(random.Random):
+    def random(self):
+        return 1.0
+
+
+class _LotSansApparition:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def random(self, n):
+        return np.ones(n)
+
+    def __getattr__(self, nom):
+        return getattr(self.rng, nom)
+
+
+def verifier(essais=3000, graine=3):
+    # Un pas de LotGalaxia contre un pas d'EtatJeu depuis le même état tiré au
+    # hasard (vaisseau, ennemis, lasers, astéroïdes et actions) ; renvoie le
+    # nombre d'états où ils diffèrent
+    from ClaudeGalaxia import EtatJeu, Ennemi, Laser, Asteroide
+
+    r = random.Random(graine)
+    differences = 0
+    for _ in range(essais):
+        pimpage = {'vitesse': 1, 'bouclier': 0, 'puissance_tir': r.choice([0, 5, 15])}
+        etat = EtatJeu('standard', pimpage, 0)
+        etat.rng = _EtatSansApparition(1)
+        etat.missions = []
+        etat.mission_actuelle = None
+        lot = LotGalaxia(1, 0, pimpage)
+        lot.rng = _LotSansApparition(lot.rng)
+
+        v = etat.vaisseau
+        v.rect.topleft = (r.randint(0, 760), r.randint(0, 550))
+        v.vitesse = r.choice([5, 5.5, 6])
+        v.bouclier = r.choice([100, 20, 15])
+        v.combo = r.randint(0, 3)
+        v.tick_dernier_kill = 0
+        v.xp = r.choice([0, 95])
+        v.capacite_explosion = r.choice([0, 5])
+        etat.tick = r.choice([10, 100])
+        lot.x[0], lot.y[0] = v.rect.topleft
+        lot.vitesse[0] = v.vitesse
+        lot.bouclier[0] = v.bouclier
+        lot.combo[0] = v.combo
+        lot.xp[0] = v.xp
+        lot.capacite_explosion[0] = v.capacite_explosion
+        lot.tick[0] = etat.tick
+
+        ennemis = []
+        for k in range(r.randint(0, 6)):
+            e = Ennemi(1)
+            e.rect.topleft = (r.randint(v.rect.x - 60, v.rect.x + 60), r.randint(0, 500))
+            e.vie = r.choice([10, 20, 5, 0])
+            e.direction = r.choice([-1, 1])
+            e.vitesse = r.randint(1, 4)
+            etat.ajouter(e, etat.ennemis)
+            ennemis.append(e)
+            lot.ex[0, k], lot.ey[0, k] = e.rect.topleft
+            lot.evie[0, k] = e.vie
+            lot.ed[0, k] = e.direction
+            lot.ev[0, k] = e.vitesse
+            lot.ennemi_vivant[0, k] = True
+        nombre_lasers = r.randint(0, 10)
+        for j in range(nombre_lasers):
+            laser = Laser(0, 0, pimpage['puissance_tir'])
+            laser.rect.topleft = (r.randint(v.rect.x - 40, v.rect.x + 80), r.randint(0, 560))
+            etat.ajouter(laser, etat.lasers)
+            lot.lx[0, j], lot.ly[0, j] = laser.rect.topleft
+            lot.laser_vivant[0, j] = True
+        lot.prochain_laser[0] = nombre_lasers
+        asteroides = []
+        for a in range(r.randint(0, 3)):
+            asteroide = Asteroide()
+            asteroide.rect.topleft = (r.randint(v.rect.x - 30, v.rect.x + 40), r.randint(v.rect.y - 30, v.rect.y + 40))
+            asteroide.vitesse = r.randint(1, 3)
+            etat.ajouter(asteroide, etat.asteroides)
+            asteroides.append(asteroide)
+            lot.ax[0, a], lot.ay[0, a] = asteroide.rect.topleft
+            lot.av[0, a] = asteroide.vitesse
+            lot.ares[0, a] = asteroide.ressources
+            lot.asteroide_vivant[0, a] = True
+
+        actions = r.getrandbits(4)
+        if r.random() < 0.5:
+            actions |= ACTION_TIR
+        if r.random() < 0.1:
+            actions |= ACTION_EXPLOSION
+        etat.pas(actions)
+        _, _, terminees = lot.pas(np.array([actions]))
+
+        if terminees[0]:
+            identiques = etat.termine
+        else:
+            identiques = (not etat.termine and (lot.x[0], lot.y[0]) == v.rect.topleft
+                          and abs(lot.bouclier[0] - v.bouclier) < 1e-9 and abs(lot.score[0] - etat.score) < 1e-6
+                          and lot.xp[0] == v.xp and lot.combo[0] == v.combo and lot.ressources[0] == etat.ressources)
+            for k, e in enumerate(ennemis):
+                if e.alive() != lot.ennemi_vivant[0, k]:
+                    identiques = False
+                # Un ennemi sorti en bas repart d'un tirage propre à chacun
+                elif e.alive() and e.rect.top <= HAUTEUR and (
+                        (lot.ex[0, k], lot.ey[0, k]) != e.rect.topleft or lot.evie[0, k] != e.vie):
+                    identiques = False
+            for a, asteroide in enumerate(asteroides):
+                if asteroide.alive() != lot.asteroide_vivant[0, a]:
+                    identiques = False
+            lasers_lot = sorted((int(lot.lx[0, j]), int(lot.ly[0, j]))
+                                for j in np.flatnonzero(lot.laser_vivant[0]))
+            if sorted(laser.rect.topleft for laser in etat.lasers) != lasers_lot:
+                identiques = False
+        differences += not identiques
+    return differences
+
+
+def mesurer_debit(n, pas=200, graine=0):
+    # Pas de parties par seconde, avec des actions au hasard (un tir sur trois pas)
+    lot = LotGalaxia(n, graine)
+    rng = np.random.default_rng(graine)
+    actions = [rng.integers(0, 16, n) | np.where(rng.random(n) < 0.3, ACTION_TIR, 0) for _ in range(50)]
+    for i in range(120):
+        lot.pas(actions[i % len(actions)])
+    debut = time.perf_counter()
+    for i in range(pas):
+        lot.pas(actions[i % len(actions)])
+    return n * pas / (time.perf_counter() - debut)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie LotGalaxia contre EtatJeu et mesure son débit.")
+    parser.add_argument("--verifier", type=int, default=0, metavar="ESSAIS",
+                        help="comparer un pas à EtatJeu sur ce nombre d'états tirés au hasard")
+    parser.add_argument("--debit", type=int, default=0, metavar="PARTIES",
+                        help="mesurer les pas par seconde d'un lot de ce nombre de parties")
+    args = parser.parse_args()
+    if args.verifier:
+        differences = verifier(args.verifier)
+        print(f"{differences} différence(s) avec EtatJeu sur {args.verifier} états")
+    if args.debit:
+        print(f"{mesurer_debit(args.debit):.0f} pas de parties par seconde ({args.debit} parties)")
+    if args.verifier and differences:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Rejeu sans affichage des journaux de Galaxia.
+
+LecteurPartie refait la partie d'un journal (voir journal_galaxia) avec
+EtatJeu, aussi vite que le processeur le permet, et garde une copie de l'état
+tous les intervalle pas. aller_a(pas) repart de la copie la plus proche avant
+le pas demandé, ou de l'état courant s'il est plus près : revenir à la minute
+25 ne rejoue pas la partie depuis le début.
+
+Sans fichier, c'est la dernière partie jouée (JOURNAL_PARTIE) qui est relue.
+
+    python galaxia_rejeu.py
+    python galaxia_rejeu.py partie.gxj --aller-a 1500 --aller-a 600
+"""
+import argparse
+import bisect
+import time
+
+from ClaudeGalaxia import EtatJeu, FREQUENCE_LOGIQUE, JOURNAL_PARTIE
+from journal_galaxia import lire_journal
+
+# Une copie toutes les 10 secondes de jeu
+INTERVALLE_INSTANTANES = 10 * FREQUENCE_LOGIQUE
+
+
+class LecteurPartie:
+    def __init__(self, journal, intervalle=INTERVALLE_INSTANTANES):
+        if isinstance(journal, str):
+            journal = lire_journal(journal)
+        self.journal = journal
+        self.intervalle = intervalle
+        self.etat = EtatJeu(journal.type_vaisseau, dict(journal.pimpage), journal.graine)
+        # Instantanés par pas croissant ; ce sont des copies qu'on ne fait jamais avancer
+        self.pas_instantanes = [0]
+        self.instantanes = [self.etat.copier()]
+
+    @property
+    def pas(self):
+        return self.etat.tick
+
+    @property
+    def duree(self):
+        return len(self.journal.actions)
+
+    def avancer(self, nombre=1):
+        actions = self.journal.actions
+        etat = self.etat
+        fin = min(etat.tick + nombre, len(actions))
+        while etat.tick < fin and not etat.termine:
+            etat.pas(actions[etat.tick])
+            if etat.tick % self.intervalle == 0 and etat.tick > self.pas_instantanes[-1]:
+                self.pas_instantanes.append(etat.tick)
+                self.instantanes.append(etat.copier())
+
+    def aller_a(self, pas):
+        pas = min(pas, self.duree)
+        k = bisect.bisect_right(self.pas_instantanes, pas) - 1
+        if not self.pas_instantanes[k] <= self.etat.tick <= pas:
+            self.etat = self.instantanes[k].copier()
+        self.avancer(pas - self.etat.tick)
+
+    def rejouer(self):
+        self.avancer(self.duree - self.etat.tick)
+        return self.etat.score
+
+    def verifier(self):
+        # Le score rejoué est-il celui que le journal a enregistré ?
+        return self.journal.score is None or self.rejouer() == self.journal.score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejoue un journal de Galaxia sans affichage.")
+    parser.add_argument("journal", nargs="?", default=JOURNAL_PARTIE,
+                        help=f"fichier écrit par jeu_principal (par défaut {JOURNAL_PARTIE})")
+    parser.add_argument("--aller-a", type=float, action="append", default=[], metavar="SECONDES",
+                        help="se placer à ce temps de jeu et afficher l'état (répétable)")
+    args = parser.parse_args()
+
+    lecteur = LecteurPartie(args.journal)
+    journal = lecteur.journal
+    duree = lecteur.duree / FREQUENCE_LOGIQUE
+    print(f"{journal.type_vaisseau}, pimpage {journal.pimpage}, graine {journal.graine}, "
+          f"{lecteur.duree} pas ({duree:.0f} s)")
+
+    debut = time.perf_counter()
+    score = lecteur.rejouer()
+    ecoule = time.perf_counter() - debut
+    print(f"Score rejoué : {score} en {ecoule:.2f} s ({duree / max(ecoule, 1e-9):.0f}x le temps réel)")
+    if journal.score is None:
+        print("Journal non fermé : pas de score enregistré à comparer")
+    elif score == journal.score:
+        print("Score conforme au journal")
+    else:
+        print(f"Score différent du journal ({journal.score})")
+
+    for secondes in args.aller_a:
+        debut = time.perf_counter()
+        lecteur.aller_a(round(secondes * FREQUENCE_LOGIQUE))
+        etat = lecteur.etat
+        print(f"{secondes:.0f} s (pas {etat.tick}, atteint en {time.perf_counter() - debut:.3f} s) : "
+              f"score {etat.score}, niveau {etat.niveau}, bouclier {int(etat.vaisseau.bouclier)}, "
+              f"{len(etat.ennemis)} ennemis")
+
+
+if __name__ == "__main__":
+    main()
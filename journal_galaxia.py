@@ -0,0 +1,148 @@
+"""Journal binaire des parties de Galaxia.
+
+Une partie d'EtatJeu est entièrement déterminée par sa graine, le type de
+vaisseau, le pimpage et le masque ACTION_* de chaque pas : c'est tout ce que
+le journal garde. Les masques sont regroupés en séries (nombre de pas
+identiques, masque) et compressés au fil de l'eau, si bien qu'une demi-heure
+de jeu tient en quelques Ko.
+
+Format (entiers petit-boutistes) :
+
+    'GXJ1'  graine u64  type (u8 longueur + utf-8)
+            pimpage (u8 nombre, puis u8 longueur + clé utf-8 + i16 valeur)
+    flux zlib de séries : nombre de pas en varint, masque u8
+    'FIN!'  pas u64  score f64      (écrit par fermer, absent après un plantage)
+
+Le flux est vidé sur le disque tous les pas_par_vidage pas : après un
+plantage, on perd au plus ces derniers pas.
+"""
+import struct
+import zlib
+
+MAGIE = b'GXJ1'
+MAGIE_FIN = b'FIN!'
+FIN = struct.Struct('<4sQd')
+
+
+def _chaine(texte):
+    donnees = texte.encode('utf-8')
+    return struct.pack('<B', len(donnees)) + donnees
+
+
+def _varint(nombre):
+    octets = bytearray()
+    while nombre >= 0x80:
+        octets.append(nombre & 0x7F | 0x80)
+        nombre >>= 7
+    octets.append(nombre)
+    return bytes(octets)
+
+
+class EnregistreurPartie:
+    def __init__(self, chemin, type_vaisseau, pimpage, graine, pas_par_vidage=3600):
+        self.fichier = open(chemin, 'wb')
+        self.pas_par_vidage = pas_par_vidage
+        self.compresseur = zlib.compressobj(9)
+        self.pas = 0
+        self.masque = None
+        self.repetitions = 0
+        entete = [MAGIE, struct.pack('<Q', graine), _chaine(type_vaisseau),
+                  struct.pack('<B', len(pimpage))]
+        for cle, valeur in pimpage.items():
+            entete += [_chaine(cle), struct.pack('<h', valeur)]
+        self.fichier.write(b''.join(entete))
+
+    def ajouter(self, actions):
+        self.pas += 1
+        if actions == self.masque:
+            self.repetitions += 1
+        else:
+            self._ecrire_serie()
+            self.masque = actions
+            self.repetitions = 1
+        if self.pas % self.pas_par_vidage == 0:
+            self._ecrire_serie()
+            self.repetitions = 0
+            self.fichier.write(self.compresseur.flush(zlib.Z_SYNC_FLUSH))
+            self.fichier.flush()
+
+    def _ecrire_serie(self):
+        if self.repetitions:
+            self.fichier.write(self.compresseur.compress(_varint(self.repetitions) + bytes([self.masque])))
+
+    def fermer(self, score=0):
+        if self.fichier.closed:
+            return
+        self._ecrire_serie()
+        self.repetitions = 0
+        self.fichier.write(self.compresseur.flush())
+        self.fichier.write(FIN.pack(MAGIE_FIN, self.pas, score))
+        self.fichier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.fermer()
+
+
+class JournalPartie:
+    def __init__(self, graine, type_vaisseau, pimpage, actions, score=None):
+        self.graine = graine
+        self.type_vaisseau = type_vaisseau
+        self.pimpage = pimpage
+        self.actions = actions  # bytes : un masque par pas
+        self.score = score      # None si la partie n'a pas été fermée
+
+
+def lire_journal(chemin):
+    with open(chemin, 'rb') as fichier:
+        donnees = fichier.read()
+    if donnees[:4] != MAGIE:
+        raise ValueError(f"{chemin} n'est pas un journal Galaxia")
+
+    position = 4
+
+    def lire(format_):
+        nonlocal position
+        valeurs = struct.unpack_from(format_, donnees, position)
+        position += struct.calcsize(format_)
+        return valeurs[0]
+
+    def lire_chaine():
+        nonlocal position
+        longueur = lire('<B')
+        position += longueur
+        return donnees[position - longueur:position].decode('utf-8')
+
+    graine = lire('<Q')
+    type_vaisseau = lire_chaine()
+    pimpage = {}
+    for _ in range(lire('<B')):
+        cle = lire_chaine()
+        pimpage[cle] = lire('<h')
+
+    decompresseur = zlib.decompressobj()
+    series = decompresseur.decompress(donnees[position:])
+    actions = bytearray()
+    i = 0
+    while True:
+        # Une série coupée par un plantage est ignorée
+        repetitions, decalage = 0, 0
+        while i < len(series) and series[i] & 0x80:
+            repetitions |= (series[i] & 0x7F) << decalage
+            decalage += 7
+            i += 1
+        if i + 1 >= len(series):
+            break
+        repetitions |= series[i] << decalage
+        actions += bytes([series[i + 1]]) * repetitions
+        i += 2
+
+    score = None
+    fin = decompresseur.unused_data
+    if len(fin) == FIN.size:
+        magie, pas, score = FIN.unpack(fin)
+        if magie != MAGIE_FIN or pas != len(actions):
+            raise ValueError(f"{chemin} : fin de journal incohérente")
+    return JournalPartie(graine, type_vaisseau, pimpage, bytes(actions), score)
@@ -0,0 +1,182 @@
+"""Multi-process particle update for the particle simulation.
+
+``ParallelParticleSystem`` keeps every particle array in
+``multiprocessing.shared_memory`` and lets a pool of worker processes each
+advance a contiguous range of slots. The main process keeps the free-list,
+spawning, culling and the random stream, so a seeded run gives exactly the
+same particles as the serial ``ParticleSystem``::
+
+    python bench_particules.py --particles 1000000 --workers 16
+"""
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import ClaudeParticules as particules
+
+# Per-frame inputs broadcast to the workers through a shared float64 block
+COMMAND, END, MOUSE_X, MOUSE_Y, HAS_MOUSE, WIND_EFFECT, WIND_STRENGTH, PARTICLE_SPEED = range(8)
+CONTROL_SIZE = 8
+RUN, STOP = 0, 1
+# Seconds to wait for the workers at a barrier before giving up on the pool
+BARRIER_TIMEOUT = 5
+
+
+def _release(blocks, unlink):
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # An array over the block is still referenced somewhere; the
+            # mapping goes away with the process instead.
+            pass
+        if unlink:
+            block.unlink()
+
+
+class SharedParticleSystem(particules.ParticleSystem):
+    """ParticleSystem whose arrays live in named shared memory blocks.
+
+    Given ``names`` (as returned by :attr:`names`) it attaches to the blocks of
+    another process instead and only carries the arrays: that is what workers
+    use to advance their share of the slots.
+    """
+
+    def __init__(self, capacity=100000, seed=None, names=None):
+        self.blocks = {}
+        self._attach_to = names
+        if names is None:
+            super().__init__(capacity, seed)
+        else:
+            self.capacity = capacity
+            for name, dtype in self.FIELDS:
+                setattr(self, name, self._new_array(name, dtype))
+
+    def _new_array(self, name, dtype):
+        dtype = np.dtype(dtype)
+        if self._attach_to is None:
+            # Fresh blocks are zero-filled, like np.zeros
+            block = shared_memory.SharedMemory(create=True, size=max(self.capacity * dtype.itemsize, 1))
+        else:
+            block = shared_memory.SharedMemory(name=self._attach_to[name])
+        self.blocks[name] = block
+        return np.ndarray(self.capacity, dtype=dtype, buffer=block.buf)
+
+    @property
+    def names(self):
+        return {name: block.name for name, block in self.blocks.items()}
+
+    def close(self):
+        """Drop the arrays and the blocks; the creating process also unlinks them."""
+        for name, _ in self.FIELDS:
+            setattr(self, name, None)
+        _release(self.blocks.values(), unlink=self._attach_to is None)
+        self.blocks = {}
+
+
+def worker_main(index, workers, capacity, names, control_name, barrier):
+    particles = SharedParticleSystem(capacity, names=names)
+    control_block = shared_memory.SharedMemory(name=control_name)
+    control = np.ndarray(CONTROL_SIZE, dtype=np.float64, buffer=control_block.buf)
+    try:
+        while True:
+            barrier.wait()
+            if control[COMMAND] == STOP:
+                break
+            n = int(control[END])
+            mouse_pos = (float(control[MOUSE_X]), float(control[MOUSE_Y])) if control[HAS_MOUSE] else None
+            particles.advance(index * n // workers, (index + 1) * n // workers, mouse_pos,
+                              bool(control[WIND_EFFECT]), float(control[WIND_STRENGTH]),
+                              float(control[PARTICLE_SPEED]))
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass  # the main process gave up on the pool
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        del control
+        particles.close()
+        _release([control_block], unlink=False)
+
+
+class ParallelParticleSystem(SharedParticleSystem):
+    """Particle pool whose per-frame update is split across worker processes.
+
+    Each frame the main process draws the random numbers the update needs,
+    writes the inputs to a shared control block and meets the workers at a
+    barrier twice: once to start them, once when every range is done. If a
+    worker dies or hangs, the barrier breaks or times out; the pool is then
+    stopped and later frames are stepped serially in the main process. Call
+    :meth:`close` to stop the workers and free the memory.
+    """
+
+    def __init__(self, capacity=100000, seed=None, workers=None, start_method=None):
+        super().__init__(capacity, seed)
+        self.workers = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context(start_method)
+        self.control_block = shared_memory.SharedMemory(create=True, size=CONTROL_SIZE * 8)
+        self.control = np.ndarray(CONTROL_SIZE, dtype=np.float64, buffer=self.control_block.buf)
+        self.barrier = context.Barrier(self.workers + 1)
+        self.processes = [
+            context.Process(target=worker_main, daemon=True,
+                            args=(k, self.workers, capacity, self.names, self.control_block.name,
+                                  self.barrier))
+            for k in range(self.workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def update(self, mouse_pos, wind_effect, wind_strength, particle_speed):
+        if not self.processes:
+            super().update(mouse_pos, wind_effect, wind_strength, particle_speed)
+            return
+        n = self.end
+        if n == 0:
+            return
+        self._draw_text_jitter(n, wind_effect)
+        self.control[:] = (RUN, n, mouse_pos[0] if mouse_pos else 0, mouse_pos[1] if mouse_pos else 0,
+                           bool(mouse_pos), wind_effect, wind_strength, particle_speed)
+        try:
+            self.barrier.wait(timeout=BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            # No worker has touched this frame yet: step it here
+            self._stop_workers()
+            self.advance(0, n, mouse_pos, wind_effect, wind_strength, particle_speed)
+        else:
+            try:
+                self.barrier.wait(timeout=BARRIER_TIMEOUT)
+            except threading.BrokenBarrierError:
+                # Some ranges may already be done; the ranges the failed worker
+                # did not finish skip this frame rather than risk stepping twice
+                self._stop_workers()
+        self._cull_wild(n)
+
+    def _stop_workers(self):
+        self.control[COMMAND] = STOP
+        try:
+            self.barrier.wait(timeout=BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            self.barrier.abort()  # releases workers still waiting on it
+        for process in self.processes:
+            process.join(timeout=BARRIER_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+    def close(self):
+        if self.control is not None:
+            if self.processes:
+                self._stop_workers()
+            self.control = None
+            _release([self.control_block], unlink=True)
+        super().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
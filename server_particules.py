@@ -0,0 +1,502 @@
+"""Socket.IO server streaming the particle simulation to browsers.
+
+Serves ``templates/index.html``, runs ``Simulation`` headless and feeds the
+viewers' ``mouse_move`` events into its wind. Each tick is encoded at most
+once per (keyframe/delta, quality tier), on a thread per tier so the
+simulation never waits for it, and the result is shared by every viewer;
+deltas only carry the tiles that changed since the previous tick sent.
+A viewer with too many unacknowledged frames is skipped (and resynchronised
+with a keyframe later), so a slow connection drops frames instead of stalling
+the others.
+
+Viewers opening the page with ``?mode=state`` get the quantized particle
+state instead of images (see ``StateEncoder``) and draw the dots themselves,
+which keeps per-frame payloads to a few kilobytes whatever the resolution.
+
+    python server_particules.py --port 5000 --fps 30
+"""
+import argparse
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+from flask import Flask, render_template, request
+from flask_socketio import SocketIO
+
+try:
+    from PIL import Image
+except ImportError:  # pygame can still write PNG, but only the lossless tier
+    Image = None
+
+import ClaudeParticules as particules
+import particle_workers
+from fixed_timestep import FixedTimestep
+
+TILE = 64
+ATLAS_COLUMNS = 16
+# Deltas touching more than this share of the tiles are sent as keyframes
+MAX_DELTA_AREA = 0.5
+# Frames a viewer may have unacknowledged before it starts dropping frames
+MAX_IN_FLIGHT = 3
+# A viewer that has not acknowledged a frame for this long is sent a keyframe again
+ACK_TIMEOUT = 2.0
+# Tier -> (format, palette size). Frames are a few colours of dots on black,
+# which lossy codecs blur into larger files than PNG; the lossy tiers instead
+# quantize to an adaptive palette (a rendered frame holds ~250 colours, so
+# "high" is close to lossless) and stay PNG, smallest last.
+QUALITY_TIERS = {
+    "lossless": ("png", None),
+    "high": ("png", 256),
+    "medium": ("png", 8),
+    "low": ("png", 4),
+}
+PNG_COMPRESS_LEVEL = 6
+# Viewer protocols and the event each one is streamed on: encoded images of
+# the rendered screen, or the particle state for the page to draw itself
+MODES = {"pixels": "update_frame", "state": "update_state"}
+# Stand-in cursor while no viewer has moved the mouse: far enough that the
+# wind only decays, exactly as when the real cursor is away from the orbit
+NO_CURSOR = (-10000, -10000)
+
+
+def encode_image(surface, fmt, colors):
+    buffer = io.BytesIO()
+    if Image is not None:
+        image = Image.frombytes("RGB", surface.get_size(), pygame.image.tobytes(surface, "RGB"))
+        if colors is not None:
+            image = image.quantize(colors, method=Image.Quantize.FASTOCTREE)
+        image.save(buffer, fmt.upper(), compress_level=PNG_COMPRESS_LEVEL)
+    else:
+        pygame.image.save(surface, buffer, "frame." + fmt)
+    return buffer.getvalue()
+
+
+def available_tier(tier):
+    if tier not in QUALITY_TIERS or (Image is None and QUALITY_TIERS[tier][1] is not None):
+        return "lossless"
+    return tier
+
+
+class TickFrame:
+    """One rendered tick, encoded lazily and at most once per (kind, tier).
+
+    A delta packs the dirty tiles into a single atlas image, ``ATLAS_COLUMNS``
+    tiles wide, so a tick costs one encode and one image header whatever the
+    number of tiles; ``tiles`` lists each tile's screen rect in atlas order.
+    The delta applies on top of tick ``since``.
+    """
+
+    def __init__(self, tick, surface, dirty_tiles, since=None):
+        self.tick = tick
+        self.surface = surface
+        self.dirty_tiles = dirty_tiles
+        self.since = tick - 1 if since is None else since
+        self._atlas = None
+        self._atlas_lock = threading.Lock()
+        self._payloads = {}
+
+    def after(self, older):
+        """This tick as a delta on top of ``older.since``, for when ``older`` is never sent."""
+        tiles = None
+        if self.dirty_tiles is not None and older.dirty_tiles is not None:
+            tiles = sorted(set(self.dirty_tiles).union(older.dirty_tiles))
+            width, height = self.surface.get_size()
+            if len(tiles) > MAX_DELTA_AREA * -(-width // TILE) * -(-height // TILE):
+                tiles = None
+        return TickFrame(self.tick, self.surface, tiles, older.since)
+
+    def atlas(self):
+        # Encoder threads of several tiers may ask for the same tick's atlas
+        with self._atlas_lock:
+            if self._atlas is None:
+                self._atlas = self._pack_atlas()
+        return self._atlas
+
+    def _pack_atlas(self):
+        bounds = self.surface.get_rect()
+        count = len(self.dirty_tiles)
+        columns = min(count, ATLAS_COLUMNS) or 1
+        atlas = pygame.Surface((columns * TILE, -(-count // columns) * TILE or TILE))
+        rects = []
+        for i, (tx, ty) in enumerate(self.dirty_tiles):
+            rect = pygame.Rect(tx * TILE, ty * TILE, TILE, TILE).clip(bounds)
+            atlas.blit(self.surface, ((i % columns) * TILE, (i // columns) * TILE), rect)
+            rects.append([rect.x, rect.y, rect.width, rect.height])
+        return atlas, columns, rects
+
+    def payload(self, key, tier):
+        if self.dirty_tiles is None:
+            key = True
+        cache_key = (key, tier)
+        if cache_key not in self._payloads:
+            fmt, colors = QUALITY_TIERS[tier]
+            if key:
+                width, height = self.surface.get_size()
+                data = {"tick": self.tick, "key": True, "format": fmt, "width": width, "height": height,
+                        "image": encode_image(self.surface, fmt, colors)}
+            else:
+                atlas, columns, rects = self.atlas()
+                data = {"tick": self.tick, "key": False, "format": fmt, "tile": TILE, "columns": columns,
+                        "tiles": rects}
+                if rects:
+                    data["image"] = encode_image(atlas, fmt, colors)
+            self._payloads[cache_key] = data
+        return self._payloads[cache_key]
+
+
+class TierEncoder:
+    """Encodes and sends one quality tier's frames on its own thread.
+
+    Only the newest tick waits for the thread: one that was still waiting is
+    dropped and its dirty tiles carried into the newer delta, so a tier whose
+    encode is slower than the stream rate sends fewer frames instead of
+    falling behind, and ``FrameStreamer.step`` never waits for an encode.
+    """
+
+    def __init__(self, tier, send):
+        self.tier = tier
+        self.send = send
+        self.dropped = 0
+        self._pending = None
+        self._stopping = False
+        self._ready = threading.Condition()
+        self._thread = threading.Thread(target=self._work, name="encode-" + tier, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        with self._ready:
+            if self._pending is not None:
+                frame = frame.after(self._pending)
+                self.dropped += 1
+            self._pending = frame
+            self._ready.notify()
+
+    def _work(self):
+        while True:
+            with self._ready:
+                while self._pending is None and not self._stopping:
+                    self._ready.wait()
+                if self._stopping:
+                    return
+                frame, self._pending = self._pending, None
+            self.send(self.tier, frame)
+
+    def close(self):
+        """Drop the tick still waiting, if any, and stop after the one being sent."""
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+        self._thread.join()
+
+
+class StateFrame:
+    """One tick of the particle state stream; the keyframe is only built if a viewer needs one."""
+
+    def __init__(self, tick, encoder, delta):
+        self.tick = tick
+        self.encoder = encoder
+        self.delta = delta
+        self._key = None
+
+    def payload(self, key, tier=None):
+        if key or self.delta is None:
+            if self._key is None:
+                self._key = self.encoder.keyframe(self.tick)
+            return self._key
+        return self.delta
+
+
+class StateEncoder:
+    """Quantizes the particle pool into the compact binary state stream.
+
+    Every message is zlib-compressed and starts with a 16-byte little-endian
+    header: version u8, kind u8 (0 keyframe, 1 delta), reserved u16, tick u32,
+    slot count u32 and record count u32. Particles are addressed by their
+    stable pool slot, positions are whole pixels and colours are indices into
+    ``METAL_COLORS`` (``HIDDEN`` for dead or off-screen slots).
+
+    A keyframe holds x u16, y u16 and colour u8 for every slot. A delta holds
+    the records for slots that appeared, changed colour or jumped more than a
+    signed byte (slot u32, x u16, y u16), then dx i8 and dy i8 for every slot,
+    then the records' colours u8. The encoder tracks exactly what clients hold,
+    so hidden slots send zero offsets and stay put until they show up again.
+    """
+
+    VERSION = 1
+    HIDDEN = 255
+    HEADER = struct.Struct("<BBHIII")
+
+    def __init__(self, particles):
+        self.particles = particles
+        self.reset()
+
+    def reset(self):
+        self.x = self.y = self.c = None
+
+    def _quantize(self):
+        particles = self.particles
+        end = particles.end
+        x = particles.x[:end].astype(np.int32)
+        y = particles.y[:end].astype(np.int32)
+        visible = particles.alive[:end] & (x >= 0) & (x < particules.WIDTH) & (y >= 0) & (y < particules.HEIGHT)
+        c = np.where(visible, particles.color[:end], self.HIDDEN).astype(np.uint8)
+        return np.clip(x, 0, 0xFFFF), np.clip(y, 0, 0xFFFF), c
+
+    def encode(self, tick):
+        x, y, c = self._quantize()
+        end = len(c)
+        if self.c is None:
+            self.x, self.y, self.c = x, y, c
+            return StateFrame(tick, self, None)
+
+        known = len(self.c)
+        px, py, pc = (np.resize(arr, end) for arr in (self.x, self.y, self.c))
+        pc[known:] = self.HIDDEN
+        dx, dy = x - px, y - py
+        still_hidden = (c == self.HIDDEN) & (pc == self.HIDDEN)
+        dx[still_hidden] = 0
+        dy[still_hidden] = 0
+        changed = (c != pc) | (np.abs(dx) > 127) | (np.abs(dy) > 127)
+        changed[known:] = True
+        dx[changed] = 0
+        dy[changed] = 0
+        slots = np.flatnonzero(changed)
+
+        px += dx
+        py += dy
+        px[slots] = x[slots]
+        py[slots] = y[slots]
+        self.x, self.y, self.c = px, py, c
+
+        body = b"".join((self.HEADER.pack(self.VERSION, 1, 0, tick, end, len(slots)),
+                         slots.astype("<u4").tobytes(), x[slots].astype("<u2").tobytes(),
+                         y[slots].astype("<u2").tobytes(), dx.astype(np.int8).tobytes(),
+                         dy.astype(np.int8).tobytes(), c[slots].tobytes()))
+        return StateFrame(tick, self, zlib.compress(body, 1))
+
+    def keyframe(self, tick):
+        end = len(self.c)
+        body = b"".join((self.HEADER.pack(self.VERSION, 0, 0, tick, end, end),
+                         self.x.astype("<u2").tobytes(), self.y.astype("<u2").tobytes(), self.c.tobytes()))
+        return zlib.compress(body, 1)
+
+
+class Viewer:
+    def __init__(self, sid, tier, mode="pixels"):
+        self.sid = sid
+        self.tier = tier
+        self.mode = mode
+        self.in_flight = 0
+        self.last_ack = time.monotonic()
+        self.last_tick = -1
+        self.sent = 0
+        self.dropped = 0
+
+
+class FrameStreamer:
+    def __init__(self, socketio, fps=30, seed=None, particles=10000, workers=0):
+        self.socketio = socketio
+        self.fps = fps
+        self.screen = particules.open_screen(offscreen=True)
+        capacity = max(particles * 2, 100000)
+        pool = None
+        if workers:
+            pool = particle_workers.ParallelParticleSystem(capacity, seed=seed, workers=workers)
+        self.simulation = particules.Simulation(seed=seed, max_particles=capacity,
+                                                initial_particles=particles, particles=pool)
+        self.state_encoder = StateEncoder(self.simulation.particles)
+        self.mouse_pos = NO_CURSOR
+        self.viewers = {}
+        self.lock = threading.Lock()
+        self.encoders = {tier: TierEncoder(tier, self._send_pixels) for tier in QUALITY_TIERS}
+        self.tick = 0
+        self.previous = None
+        self.running = False
+
+    def add_viewer(self, sid, tier, mode="pixels"):
+        with self.lock:
+            self.viewers[sid] = Viewer(sid, available_tier(tier), mode if mode in MODES else "pixels")
+
+    def remove_viewer(self, sid):
+        with self.lock:
+            self.viewers.pop(sid, None)
+
+    def set_quality(self, sid, tier):
+        with self.lock:
+            viewer = self.viewers.get(sid)
+            if viewer:
+                viewer.tier = available_tier(tier)
+                viewer.last_tick = -1  # the next frame must be a keyframe in the new format
+
+    def set_mouse(self, x, y):
+        self.mouse_pos = (x, y)
+
+    def _acknowledge(self, sid):
+        with self.lock:
+            viewer = self.viewers.get(sid)
+            if viewer and viewer.in_flight:
+                viewer.in_flight -= 1
+                viewer.last_ack = time.monotonic()
+
+    def _dirty_tiles(self, pixels):
+        previous, self.previous = self.previous, pixels
+        if previous is None:
+            return None
+        width, height = pixels.shape
+        changed = pixels != previous
+        # Any-reduce each TILE-wide band of columns, then each band of rows
+        dirty = np.logical_or.reduceat(changed, np.arange(0, width, TILE), axis=0)
+        dirty = np.logical_or.reduceat(dirty, np.arange(0, height, TILE), axis=1)
+        if np.count_nonzero(dirty) > MAX_DELTA_AREA * dirty.size:
+            return None
+        return list(zip(*(axis.tolist() for axis in np.nonzero(dirty))))
+
+    def _claim(self, viewer, tick, since, now):
+        """Whether to send ``viewer`` a keyframe of ``tick``, or None to skip it; call under the lock."""
+        if viewer.in_flight >= MAX_IN_FLIGHT:
+            if now - viewer.last_ack < ACK_TIMEOUT:
+                # Too far behind: skip this tick, the next frame it gets is a keyframe
+                viewer.dropped += 1
+                return None
+            viewer.in_flight = 0
+            viewer.last_tick = -1
+        # Deltas are only valid on top of the tick they were taken against
+        key = viewer.last_tick != since
+        viewer.last_tick = tick
+        viewer.in_flight += 1
+        if viewer.in_flight == 1:
+            viewer.last_ack = now
+        viewer.sent += 1
+        return key
+
+    def _emit(self, viewer, payload):
+        self.socketio.emit(MODES[viewer.mode], payload, to=viewer.sid,
+                           callback=lambda *_, sid=viewer.sid: self._acknowledge(sid))
+
+    def _send_pixels(self, tier, frame):
+        # Runs on the tier's encoder thread. set_quality and the ACK callbacks
+        # touch the same viewer fields, so claim the frame under the lock
+        now = time.monotonic()
+        with self.lock:
+            claims = [(viewer, self._claim(viewer, frame.tick, frame.since, now))
+                      for viewer in self.viewers.values() if viewer.mode == "pixels" and viewer.tier == tier]
+        for viewer, key in claims:
+            if key is not None:
+                self._emit(viewer, frame.payload(key, tier))
+
+    def step(self, steps=1, alpha=1.0):
+        for _ in range(steps):
+            self.simulation.update(self.mouse_pos)
+        with self.lock:
+            viewers = list(self.viewers.values())
+        tiers = {viewer.tier for viewer in viewers if viewer.mode == "pixels"}
+        if tiers:
+            self.simulation.draw(alpha)
+            # order="K" keeps pixels2d's column-major layout, making this a plain memcpy
+            dirty_tiles = self._dirty_tiles(pygame.surfarray.pixels2d(self.screen).copy(order="K"))
+            # Encoded on the tier threads while the next ticks redraw the screen
+            frame = TickFrame(self.tick, self.screen.copy(), dirty_tiles)
+            for tier in tiers:
+                self.encoders[tier].submit(frame)
+        else:
+            self.previous = None
+        if any(viewer.mode == "state" for viewer in viewers):
+            frame = self.state_encoder.encode(self.tick)
+            now = time.monotonic()
+            with self.lock:
+                claims = [(viewer, self._claim(viewer, self.tick, self.tick - 1, now))
+                          for viewer in viewers if viewer.mode == "state"]
+            for viewer, key in claims:
+                if key is not None:
+                    self._emit(viewer, frame.payload(key))
+        else:
+            self.state_encoder.reset()
+        self.tick += 1
+
+    def close(self):
+        """Stop the encoder threads; ticks still waiting for them are not sent."""
+        for encoder in self.encoders.values():
+            encoder.close()
+
+    def run(self):
+        self.running = True
+        period = 1 / self.fps
+        # The simulation keeps its own pace; fps is only how often it is sent
+        timestep = FixedTimestep(particules.LOGIC_RATE, particules.MAX_CATCH_UP_STEPS)
+        deadline = time.perf_counter()
+        while self.running:
+            self.step(timestep.advance(), timestep.alpha)
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self.socketio.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+
+
+def create_app(fps=30, seed=None, default_tier="lossless", default_mode="pixels", particles=10000,
+               workers=0):
+    app = Flask(__name__)
+    socketio = SocketIO(app)
+    streamer = FrameStreamer(socketio, fps=fps, seed=seed, particles=particles, workers=workers)
+
+    @app.route("/")
+    def index():
+        return render_template("index.html")
+
+    @socketio.on("connect")
+    def on_connect():
+        streamer.add_viewer(request.sid, request.args.get("quality", default_tier),
+                            request.args.get("mode", default_mode))
+        socketio.emit("config", {"width": particules.WIDTH, "height": particules.HEIGHT,
+                                 "palette": particules.METAL_COLORS, "hidden": StateEncoder.HIDDEN},
+                      to=request.sid)
+
+    @socketio.on("disconnect")
+    def on_disconnect():
+        streamer.remove_viewer(request.sid)
+
+    @socketio.on("set_quality")
+    def on_set_quality(data):
+        streamer.set_quality(request.sid, data.get("quality"))
+
+    @socketio.on("mouse_move")
+    def on_mouse_move(data):
+        streamer.set_mouse(float(data["x"]), float(data["y"]))
+
+    return app, socketio, streamer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--fps", type=int, default=30, help="streaming rate")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--particles", type=int, default=10000, help="initial particle count")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="advance particles in this many worker processes (0: serial)")
+    parser.add_argument("--quality", choices=sorted(QUALITY_TIERS), default="lossless",
+                        help="tier for viewers that do not ask for one")
+    parser.add_argument("--mode", choices=sorted(MODES), default="pixels",
+                        help="protocol for viewers that do not ask for one")
+    args = parser.parse_args(argv)
+
+    app, socketio, streamer = create_app(fps=args.fps, seed=args.seed, default_tier=args.quality,
+                                         default_mode=args.mode, particles=args.particles,
+                                         workers=args.workers)
+    socketio.start_background_task(streamer.run)
+    socketio.run(app, host=args.host, port=args.port, allow_unsafe_werkzeug=True)
+
+
+if __name__ == "__main__":
+    main()
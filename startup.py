@@ -0,0 +1,84 @@
+"""Cold-start helpers shared by the games.
+
+Import this module before pygame so ``elapsed_ms`` has a start to measure
+from. On Linux that start is the process creation time, which includes
+interpreter startup. Elsewhere it is the first import of this module.
+
+``first_frame`` reports the time to the first presented frame once per
+process, and warns when it misses the target. ``match_font`` resolves a
+system font name to a file like ``pygame.sysfont.match_font``. The result is
+remembered on disk, so later runs skip the system font scan. That scan runs
+``fc-list`` on Linux and reads the registry on Windows, and is often the
+slowest part of startup. Delete the cache file after installing fonts.
+"""
+import json
+import os
+import sys
+import time
+
+_IMPORTED = time.perf_counter()
+
+# Per-user cache directory for files the games write (font paths, game journals)
+CACHE_DIR = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+FONT_CACHE = os.path.join(CACHE_DIR, "claude_games_fonts.json")
+
+_reported = False
+
+
+def _process_start():
+    # /proc/self/stat field 22 is the start time in clock ticks after boot
+    try:
+        with open("/proc/self/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime:
+            up = float(uptime.read().split()[0])
+        age = up - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.perf_counter() - age
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _IMPORTED
+
+
+PROCESS_START = min(_process_start(), _IMPORTED)
+
+
+def elapsed_ms():
+    return (time.perf_counter() - PROCESS_START) * 1000
+
+
+def first_frame(name, target_ms):
+    """Print the time to the first frame, the first time it is called."""
+    global _reported
+    if _reported:
+        return None
+    _reported = True
+    ms = elapsed_ms()
+    verdict = "ok" if ms <= target_ms else "over target"
+    print(f"{name}: first frame after {ms:.0f} ms (target {target_ms:.0f} ms, {verdict})",
+          file=sys.stdout if ms <= target_ms else sys.stderr)
+    return ms
+
+
+def _load_font_cache():
+    try:
+        with open(FONT_CACHE) as cache:
+            return json.load(cache)
+    except (OSError, ValueError):
+        return {}
+
+
+def match_font(name):
+    """Path of the system font ``name``, or None for pygame's default font."""
+    cache = _load_font_cache()
+    if name in cache and (cache[name] is None or os.path.exists(cache[name])):
+        return cache[name]
+
+    import pygame.sysfont
+    path = pygame.sysfont.match_font(name)
+    cache[name] = path
+    try:
+        os.makedirs(os.path.dirname(FONT_CACHE), exist_ok=True)
+        with open(FONT_CACHE, "w") as out:
+            json.dump(cache, out, indent=1)
+    except OSError:
+        pass  # read-only home: scan again next time
+    return path